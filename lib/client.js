@@ -6,8 +6,10 @@ let activeDataset = null;
 let structure = [];
 let busy = 0;
 let lastDS = null;
+let sliderDragged = false;
 const timeCallback = [];
 const busyCallBack = [];
+const loadCallback = [];
 
 export function setup(conn, clt) {
   connection = conn;
@@ -22,6 +24,19 @@ export function setup(conn, clt) {
       }
     });
   });
+
+  session.subscribe('light.viz.dataset.progress', (args) => {
+    const task = args[0];
+    if (task.state === 'done') {
+      activeDataset = task.dataset;
+      lastDS = task.meta;
+    }
+    loadCallback.forEach((l) => {
+      if (l) {
+        l(task);
+      }
+    });
+  });
 }
 
 export function getConnection() {
@@ -89,6 +104,20 @@ export function getConfiguration(callback) {
   }, onError.bind(undefined, 'light.viz.configuration.get'));
 }
 
+// ----------------------------------------------------------------------------
+// Batch
+// ----------------------------------------------------------------------------
+
+// Best effort: on failure the operations before the failing one stay applied
+export function applyBatch(operations, callback) {
+  call('light.viz.batch.besteffort', [operations]).then((result) => {
+    onReady();
+    if (callback) {
+      callback(result);
+    }
+  }, onError.bind(undefined, 'light.viz.batch.besteffort'));
+}
+
 // ----------------------------------------------------------------------------
 // Time handler
 // ----------------------------------------------------------------------------
@@ -111,6 +140,24 @@ export function stopTime() {
   return client.TimeHandler.stop();
 }
 
+export function playAnimation(fps = 10, loop = true, callback) {
+  call('light.viz.dataset.time.play', [fps, loop]).then((state) => {
+    onReady();
+    if (callback) {
+      callback(state);
+    }
+  }, onError.bind(undefined, 'light.viz.dataset.time.play'));
+}
+
+export function pauseAnimation(callback) {
+  call('light.viz.dataset.time.pause', []).then((state) => {
+    onReady();
+    if (callback) {
+      callback(state);
+    }
+  }, onError.bind(undefined, 'light.viz.dataset.time.pause'));
+}
+
 // ----------------------------------------------------------------------------
 // ColorMap
 // ----------------------------------------------------------------------------
@@ -157,6 +204,13 @@ export function getBlockStructure(callback) {
   }, onError.bind(undefined, 'light.viz.dataset.getblockstructure'));
 }
 
+export function getBlockStats(flatIndices, callback) {
+  call('light.viz.dataset.getblockstats', [flatIndices]).then((stats) => {
+    onReady();
+    callback(stats);
+  }, onError.bind(undefined, 'light.viz.dataset.getblockstats'));
+}
+
 export function setForegroundColor(color) {
   call('light.viz.foreground.color', [color]).then(
     onReady(),
@@ -186,6 +240,21 @@ export function listDatasets(callback) {
   }, onError.bind(undefined, 'light.viz.dataset.list'));
 }
 
+export function queryDatasets(query, callback) {
+  const { offset, limit, search, sortBy, descending, fields } = query;
+  call('light.viz.dataset.catalog', [
+    offset || 0,
+    limit || 50,
+    search || null,
+    sortBy || 'name',
+    !!descending,
+    fields || null,
+  ]).then((page) => {
+    onReady();
+    callback(page);
+  }, onError.bind(undefined, 'light.viz.dataset.catalog'));
+}
+
 export function updateDatasetOpacity(opacity) {
   call('light.viz.dataset.opacity', [opacity]).then(
     onReady(),
@@ -200,18 +269,87 @@ export function updateBlockVisibility(blockVisibilities) {
   );
 }
 
-export function loadDataset(dsName, callback) {
-  if (activeDataset !== dsName || !lastDS) {
-    activeDataset = dsName;
-    call('light.viz.dataset.load', [activeDataset]).then((ds) => {
-      onReady();
-      lastDS = ds;
-      callback(ds);
-    }, onError.bind(undefined, 'light.viz.dataset.load'));
-  } else {
-    activeDataset = dsName;
+export function addLoadListener(callback) {
+  const id = loadCallback.length;
+  loadCallback.push(callback);
+  return id;
+}
+
+export function removeLoadListener(id) {
+  loadCallback[id] = null;
+}
+
+export function loadDatasetAsync(dsName, callback) {
+  call('light.viz.dataset.load.async', [dsName]).then((task) => {
+    onReady();
+    callback(task);
+  }, onError.bind(undefined, 'light.viz.dataset.load.async'));
+}
+
+// Load through the asynchronous RPC, progressCallback gets every task update
+// published until the dataset is ready
+export function loadDataset(dsName, callback, progressCallback) {
+  if (activeDataset === dsName && lastDS) {
     callback(lastDS);
+    return;
   }
+  let finished = false;
+  let listenerId = null;
+  const onTask = (task) => {
+    if (finished || task.dataset !== dsName) {
+      return;
+    }
+    if (progressCallback) {
+      progressCallback(task);
+    }
+    if (task.state === 'done') {
+      finished = true;
+      removeLoadListener(listenerId);
+      activeDataset = dsName;
+      lastDS = task.meta;
+      callback(task.meta);
+    } else if (task.state !== 'loading') {
+      finished = true;
+      removeLoadListener(listenerId);
+      console.log(`Loading of ${dsName} ${task.state}`);
+      console.log(task.error);
+    }
+  };
+  listenerId = addLoadListener(onTask);
+  loadDatasetAsync(dsName, onTask);
+}
+
+export function cancelLoadDataset(taskId) {
+  call('light.viz.dataset.load.cancel', [taskId]).then(
+    onReady,
+    onError.bind(undefined, 'light.viz.dataset.load.cancel')
+  );
+}
+
+export function previewThreshold(field, location, min, max, callback) {
+  call('light.viz.dataset.threshold.preview', [
+    field,
+    location,
+    min,
+    max,
+  ]).then((preview) => {
+    onReady();
+    callback(preview);
+  }, onError.bind(undefined, 'light.viz.dataset.threshold.preview'));
+}
+
+export function getDatasetLevels(callback) {
+  call('light.viz.dataset.levels', []).then((levels) => {
+    onReady();
+    callback(levels);
+  }, onError.bind(undefined, 'light.viz.dataset.levels'));
+}
+
+export function setDatasetLevel(level, callback) {
+  call('light.viz.dataset.level', [level]).then((activeLevel) => {
+    onReady();
+    callback(activeLevel);
+  }, onError.bind(undefined, 'light.viz.dataset.level'));
 }
 
 export function updateTime(timeIdx) {
@@ -395,6 +533,22 @@ export function setColorMapRangeToDataRange(arrayName, callback) {
   }, onError.bind(undefined, 'light.viz.colormap.rescale.todatarange'));
 }
 
+export function setColorMapRangeToPercentiles(
+  arrayName,
+  lower,
+  upper,
+  callback
+) {
+  call('light.viz.colormap.rescale.topercentiles', [
+    arrayName,
+    lower,
+    upper,
+  ]).then((result) => {
+    onReady();
+    callback(result);
+  }, onError.bind(undefined, 'light.viz.colormap.rescale.topercentiles'));
+}
+
 export function updateOpacityMap(arrayName, controlPoints) {
   call('light.viz.opacitymap.set', [arrayName, controlPoints]).then(
     onReady(),
@@ -444,6 +598,31 @@ export function getState(type, ...widgets) {
   }, onError.bind(undefined, name));
 }
 
+export function setDragging(dragging) {
+  call('light.viz.interaction.drag', [dragging]).then(
+    onReady,
+    onError.bind(undefined, 'light.viz.interaction.drag')
+  );
+}
+
+// Mouse/touch down handler for a panel line: while one of its sliders is
+// dragged the server works on the decimated input
+export function dragSlider(event) {
+  if (event.target.type !== 'range' || sliderDragged) {
+    return;
+  }
+  sliderDragged = true;
+  setDragging(true);
+  const release = () => {
+    window.removeEventListener('mouseup', release);
+    window.removeEventListener('touchend', release);
+    sliderDragged = false;
+    setDragging(false);
+  };
+  window.addEventListener('mouseup', release);
+  window.addEventListener('touchend', release);
+}
+
 export function updateUseClip(type, useClip) {
   const name = 'light.viz.TYPE.useclipped'.replace(/TYPE/, type);
   call(name, [useClip]).then(onReady, onError.bind(undefined, name));
@@ -67,6 +67,19 @@ export default class ThumbnailList extends React.Component {
     this.setState({ currentThumbnail: null });
   }
 
+  getThumbnailCount(index) {
+    // Catalog summaries only name the first thumbnail, the others are the
+    // sources loaded on the image
+    const image = this.images[index];
+    if (!image) {
+      return 1;
+    }
+    return (
+      Object.keys(image.dataset).filter((key) => key.indexOf('src-') === 0)
+        .length || 1
+    );
+  }
+
   tick(e) {
     const targetRect = e.target.getClientRects()[0];
     const newIdxScale =
@@ -84,8 +97,7 @@ export default class ThumbnailList extends React.Component {
       newIndices[this.state.currentThumbnail] !== undefined
     ) {
       newIndices[this.state.currentThumbnail] = Math.floor(
-        newIdxScale *
-          this.props.list[this.state.currentThumbnail].thumbnails.length
+        newIdxScale * this.getThumbnailCount(this.state.currentThumbnail)
       );
     }
     this.setState({
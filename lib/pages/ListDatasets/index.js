@@ -3,20 +3,27 @@ import SvgIcon from 'paraviewweb/src/React/Widgets/SvgIconWidget';
 
 import style from 'LightVizStyle/ListDatasets.mcss';
 
-import { listDatasets } from '../../client';
+import { queryDatasets } from '../../client';
 import ThumbnailList from './ThumbnailList';
 import lightVizIcon from '../../../svg/LightViz.svg';
 
 import { loadConfiguration } from '../../config';
 
+// Number of dataset summaries fetched per page
+const PAGE_SIZE = 50;
+
 export default class ListDatasets extends React.Component {
   constructor(props) {
     super(props);
     this.state = {
       datasets: [],
+      total: 0,
+      search: '',
     };
 
     this.refresh = this.refresh.bind(this);
+    this.loadMore = this.loadMore.bind(this);
+    this.updateSearch = this.updateSearch.bind(this);
   }
 
   componentDidMount() {
@@ -24,23 +31,61 @@ export default class ListDatasets extends React.Component {
     loadConfiguration();
   }
 
+  fetchPage(offset, callback) {
+    queryDatasets(
+      {
+        offset,
+        limit: PAGE_SIZE,
+        search: this.state.search,
+        fields: ['name', 'size', 'thumbnail'],
+      },
+      callback
+    );
+  }
+
   refresh() {
-    listDatasets((datasets) =>
+    this.fetchPage(0, (page) =>
       this.setState({
-        datasets,
+        datasets: page.datasets,
+        total: page.total,
       })
     );
   }
 
+  loadMore() {
+    this.fetchPage(this.state.datasets.length, (page) =>
+      this.setState({
+        datasets: this.state.datasets.concat(page.datasets),
+        total: page.total,
+      })
+    );
+  }
+
+  updateSearch(e) {
+    this.setState({ search: e.target.value }, this.refresh);
+  }
+
   render() {
     return (
       <div className={style.container}>
         <div className={style.toolbar}>
           <SvgIcon icon={lightVizIcon} width="25px" height="25px" />
+          <input
+            className={style.search}
+            type="text"
+            placeholder="Search"
+            value={this.state.search}
+            onChange={this.updateSearch}
+          />
           <i className={style.refreshButton} onClick={this.refresh} />
         </div>
         <div className={style.content}>
           <ThumbnailList list={this.state.datasets} />
+          {this.state.datasets.length < this.state.total ? (
+            <div className={style.moreButton} onClick={this.loadMore}>
+              Show more ({this.state.datasets.length}/{this.state.total})
+            </div>
+          ) : null}
         </div>
       </div>
     );
@@ -19,6 +19,7 @@ import lightVizIcon from '../../../svg/LightViz.svg';
 import {
   resetCamera,
   loadDataset,
+  cancelLoadDataset,
   getConnection,
   getClient,
   saveThumbnail,
@@ -75,12 +76,14 @@ export default class ViewDataset extends React.Component {
         autoApply: false,
       },
       datasetId: null,
+      loadProgress: 0,
       busy: false,
     };
 
     this.querySaveThumbnail = this.querySaveThumbnail.bind(this);
     this.listDataSets = this.listDataSets.bind(this);
     this.toggleAutoApply = this.toggleAutoApply.bind(this);
+    this.updateLoadProgress = this.updateLoadProgress.bind(this);
 
     this.subscriptionId = onBusyChange((busy) => this.setState({ busy }));
   }
@@ -89,10 +92,13 @@ export default class ViewDataset extends React.Component {
     this.setState({
       datasetId: this.props.match.params.datasetId,
     });
-    loadDataset(this.props.match.params.datasetId, (dataset) =>
-      this.setState({
-        dataset,
-      })
+    loadDataset(
+      this.props.match.params.datasetId,
+      (dataset) =>
+        this.setState({
+          dataset,
+        }),
+      this.updateLoadProgress
     );
   }
 
@@ -101,16 +107,26 @@ export default class ViewDataset extends React.Component {
       this.setState({
         datasetId: nextProps.match.params.datasetId,
       });
-      loadDataset(this.props.match.params.datasetId, (dataset) =>
-        this.setState({
-          dataset,
-        })
+      loadDataset(
+        this.props.match.params.datasetId,
+        (dataset) =>
+          this.setState({
+            dataset,
+          }),
+        this.updateLoadProgress
       );
     }
   }
 
   componentWillUnmount() {
     unsubscribeBusy(this.subscriptionId);
+    if (this.state.dataset.empty) {
+      cancelLoadDataset();
+    }
+  }
+
+  updateLoadProgress(task) {
+    this.setState({ loadProgress: task.progress });
   }
 
   /* eslint-disable */
@@ -153,7 +169,13 @@ export default class ViewDataset extends React.Component {
     });
 
     if (this.state.dataset.empty) {
-      return <ProgressLoaderWidget message="Dataset loading..." />;
+      return (
+        <ProgressLoaderWidget
+          message={`Dataset loading... ${Math.round(
+            this.state.loadProgress * 100
+          )}%`}
+        />
+      );
     }
 
     return (
@@ -16,6 +16,7 @@ import lightVizIcon from '../../../svg/LightViz.svg';
 import {
   resetCamera,
   loadDataset,
+  cancelLoadDataset,
   getConnection,
   getClient,
   saveThumbnail,
@@ -72,6 +73,7 @@ export default class ViewDataset2 extends React.Component {
         },
       },
       datasetId: null,
+      loadProgress: 0,
       showControls: false,
       busy: false,
     };
@@ -80,6 +82,7 @@ export default class ViewDataset2 extends React.Component {
     this.listDataSets = this.listDataSets.bind(this);
     this.toggleShowControls = this.toggleShowControls.bind(this);
     this.toggleAutoApply = this.toggleAutoApply.bind(this);
+    this.updateLoadProgress = this.updateLoadProgress.bind(this);
 
     this.subscriptionId = onBusyChange((busy) => this.setState({ busy }));
   }
@@ -88,10 +91,13 @@ export default class ViewDataset2 extends React.Component {
     this.setState({
       datasetId: this.props.match.params.datasetId,
     });
-    loadDataset(this.props.match.params.datasetId, (dataset) =>
-      this.setState({
-        dataset,
-      })
+    loadDataset(
+      this.props.match.params.datasetId,
+      (dataset) =>
+        this.setState({
+          dataset,
+        }),
+      this.updateLoadProgress
     );
   }
 
@@ -100,16 +106,26 @@ export default class ViewDataset2 extends React.Component {
       this.setState({
         datasetId: nextProps.match.params.datasetId,
       });
-      loadDataset(this.props.match.params.datasetId, (dataset) =>
-        this.setState({
-          dataset,
-        })
+      loadDataset(
+        this.props.match.params.datasetId,
+        (dataset) =>
+          this.setState({
+            dataset,
+          }),
+        this.updateLoadProgress
       );
     }
   }
 
   componentWillUnmount() {
     unsubscribeBusy(this.subscriptionId);
+    if (this.state.dataset.empty) {
+      cancelLoadDataset();
+    }
+  }
+
+  updateLoadProgress(task) {
+    this.setState({ loadProgress: task.progress });
   }
 
   querySaveThumbnail() {
@@ -161,7 +177,13 @@ export default class ViewDataset2 extends React.Component {
     });
 
     if (this.state.dataset.empty) {
-      return <ProgressLoaderWidget message="Dataset loading..." />;
+      return (
+        <ProgressLoaderWidget
+          message={`Dataset loading... ${Math.round(
+            this.state.loadProgress * 100
+          )}%`}
+        />
+      );
     }
 
     return (
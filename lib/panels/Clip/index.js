@@ -11,10 +11,12 @@ import AbstractPanel from '../AbstractPanel';
 
 import {
   getState,
+  applyBatch,
   updateClipInsideOut,
   updateClipPosition,
   updateClipBoxPosition,
   enableClipBox,
+  dragSlider,
 } from '../../client';
 
 export default class ClipPanel extends React.Component {
@@ -32,6 +34,13 @@ export default class ClipPanel extends React.Component {
       zInsideOut: false,
     };
     this.state = Object.assign({}, this.oldState);
+
+    this.onApply = this.onApply.bind(this);
+    this.onReset = this.onReset.bind(this);
+    this.updateState = this.updateState.bind(this);
+    this.toggleInsideOut = this.toggleInsideOut.bind(this);
+    this.positionChange = this.positionChange.bind(this);
+    this.onSliderDrag = this.onSliderDrag.bind(this);
   }
 
   componentDidMount() {
@@ -56,18 +65,22 @@ export default class ClipPanel extends React.Component {
 
   onApply() {
     const { xPosition, yPosition, zPosition } = this.state;
-    const pos = {
-      xPosition,
-      yPosition,
-      zPosition,
-    };
-    updateClipPosition(pos);
-    enableClipBox(false);
-    updateClipInsideOut(
-      this.state.xInsideOut,
-      this.state.yInsideOut,
-      this.state.zInsideOut
-    );
+    // One request, so the clip and what depends on it update once
+    applyBatch([
+      {
+        rpc: 'light.viz.clip.position',
+        args: [xPosition, yPosition, zPosition],
+      },
+      { rpc: 'light.viz.clip.box.show', args: [false] },
+      {
+        rpc: 'light.viz.clip.insideout',
+        args: [
+          this.state.xInsideOut,
+          this.state.yInsideOut,
+          this.state.zInsideOut,
+        ],
+      },
+    ]);
     this.oldState = Object.assign({}, this.state);
     // This is to force a re-render so that the apply button will be disabled again
     this.setState({ applyUpdate: true });
@@ -114,6 +127,13 @@ export default class ClipPanel extends React.Component {
     }
   }
 
+  onSliderDrag(e) {
+    // Without auto apply only the clip box moves
+    if (this.props.dataset.autoApply) {
+      dragSlider(e);
+    }
+  }
+
   positionChange(name, value) {
     const { xPosition, yPosition, zPosition } = this.state;
     const pos = {
@@ -154,7 +174,11 @@ export default class ClipPanel extends React.Component {
         needsApply={needsApply}
         moduleName="Clip"
       >
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.xInsideOut}
@@ -175,7 +199,11 @@ export default class ClipPanel extends React.Component {
             onChange={this.positionChange}
           />
         </div>
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.yInsideOut}
@@ -196,7 +224,11 @@ export default class ClipPanel extends React.Component {
             onChange={this.positionChange}
           />
         </div>
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.zInsideOut}
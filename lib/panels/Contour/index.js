@@ -8,7 +8,20 @@ import style from 'LightVizStyle/ContourPanel.mcss';
 
 import AbstractPanel from '../AbstractPanel';
 
-import { getState, updateContourBy, updateContourValues } from '../../client';
+import {
+  getState,
+  applyBatch,
+  updateContourValues,
+  dragSlider,
+} from '../../client';
+
+// Field and isovalues go together so that the server contours once
+function updateContour(field, values) {
+  applyBatch([
+    { rpc: 'light.viz.contour.by', args: [field] },
+    { rpc: 'light.viz.contour.values', args: [values] },
+  ]);
+}
 
 function arrayIsOnPoints(array) {
   return array.dimension === 1 && array.location === 'POINTS';
@@ -33,6 +46,7 @@ export default class ContourPanel extends React.Component {
     this.addContour = this.addContour.bind(this);
     this.removeContour = this.removeContour.bind(this);
     this.valueChange = this.valueChange.bind(this);
+    this.onSliderDrag = this.onSliderDrag.bind(this);
   }
 
   componentDidMount() {
@@ -65,8 +79,7 @@ export default class ContourPanel extends React.Component {
   }
 
   onApply() {
-    updateContourValues(this.state.values);
-    updateContourBy(this.state.field);
+    updateContour(this.state.field, this.state.values);
     this.oldState = clone(this.state);
     this.oldState.values = clone(this.state.values);
     this.setState({ applyDone: true });
@@ -123,8 +136,7 @@ export default class ContourPanel extends React.Component {
     this.oldState.applyDone = false;
 
     if (this.props.dataset.autoApply) {
-      updateContourBy(field);
-      updateContourValues(newValues);
+      updateContour(field, newValues);
     }
   }
 
@@ -167,6 +179,12 @@ export default class ContourPanel extends React.Component {
     }
   }
 
+  onSliderDrag(e) {
+    if (this.props.dataset.autoApply) {
+      dragSlider(e);
+    }
+  }
+
   valueChange(name, value) {
     const idx = Number(name);
     const values = this.state.values;
@@ -214,7 +232,12 @@ export default class ContourPanel extends React.Component {
         }
       >
         {this.state.values.map((v, idx) => (
-          <div key={idx} className={style.line}>
+          <div
+            key={idx}
+            className={style.line}
+            onMouseDown={this.onSliderDrag}
+            onTouchStart={this.onSliderDrag}
+          >
             <i
               className={style.deleteButton}
               name={idx}
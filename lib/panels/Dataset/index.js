@@ -11,6 +11,9 @@ import {
   updateBlockVisibility,
   getState,
   getBlockStructure,
+  getBlockStats,
+  getDatasetLevels,
+  setDatasetLevel,
 } from '../../client';
 
 const blockVisibilityIcons = [
@@ -28,6 +31,9 @@ export default class DatasetPanel extends React.Component {
       blocks: [],
       collapsed: [true],
       showBlock: [true],
+      levels: [],
+      activeLevel: 0,
+      blockStats: null,
     };
 
     this.onApply = this.onApply.bind(this);
@@ -41,10 +47,15 @@ export default class DatasetPanel extends React.Component {
     this.toggleCollapsed = this.toggleCollapsed.bind(this);
     this.recursiveSetVisibility = this.recursiveSetVisibility.bind(this);
     this.toggleBlockShown = this.toggleBlockShown.bind(this);
+    this.updateLevel = this.updateLevel.bind(this);
+    this.updateBlockStats = this.updateBlockStats.bind(this);
   }
 
   componentWillMount() {
     getBlockStructure(this.updateBlockStructure);
+    getDatasetLevels(({ active, levels }) =>
+      this.setState({ activeLevel: active, levels })
+    );
   }
 
   componentDidMount() {
@@ -138,6 +149,22 @@ export default class DatasetPanel extends React.Component {
     }
   }
 
+  updateLevel(e) {
+    // Level 0 is the full resolution, the others are the pyramid levels
+    setDatasetLevel(Number(e.target.value), (activeLevel) =>
+      this.setState({ activeLevel })
+    );
+  }
+
+  updateBlockStats(blocks) {
+    // Sizes of the shown blocks, from the index recorded at import
+    getBlockStats(blocks, (stats) =>
+      this.setState({
+        blockStats: stats.total.numberOfCells > 0 ? stats.total : null,
+      })
+    );
+  }
+
   updateBlockStructure(structure) {
     const showBlock = [];
     const collapsed = [];
@@ -174,6 +201,9 @@ export default class DatasetPanel extends React.Component {
       collapsed,
       showBlock,
     });
+    if (structure.length > 0) {
+      this.updateBlockStats(null);
+    }
   }
 
   toggleCollapsed(e) {
@@ -258,6 +288,7 @@ export default class DatasetPanel extends React.Component {
       }
     }
     updateBlockVisibility(blocks);
+    this.updateBlockStats(blocks);
   }
 
   render() {
@@ -285,6 +316,24 @@ export default class DatasetPanel extends React.Component {
             onChange={this.updateOpacity}
           />
         </div>
+        {this.state.levels.length > 1 ? (
+          <div className={style.contents}>
+            <i className={style.levelIcon} />
+            <select
+              className={style.levelSelector}
+              value={this.state.activeLevel}
+              onChange={this.updateLevel}
+            >
+              {this.state.levels.map((level, idx) => (
+                <option key={idx} value={idx}>
+                  {level.factor === 1
+                    ? 'Full resolution'
+                    : `1/${level.factor} resolution`}
+                </option>
+              ))}
+            </select>
+          </div>
+        ) : null}
         <div
           style={{ marginLeft: '-5px' }}
           className={
@@ -318,6 +367,13 @@ export default class DatasetPanel extends React.Component {
           </span>
           {this.state.blocks.map(this.createBlocksTree)}
         </div>
+        {this.state.blockStats ? (
+          <div className={style.blockStats}>
+            {this.state.blockStats.numberOfCells.toLocaleString()} cells,{' '}
+            {this.state.blockStats.numberOfPoints.toLocaleString()} points
+            shown
+          </div>
+        ) : null}
       </AbstractPanel>
     );
   }
@@ -14,6 +14,7 @@ import {
   getState,
   updateSlicesVisible,
   updateSlicePosition,
+  dragSlider,
 } from '../../client';
 
 export default class SlicePanel extends React.Component {
@@ -35,6 +36,7 @@ export default class SlicePanel extends React.Component {
     this.onApply = this.onApply.bind(this);
     this.onReset = this.onReset.bind(this);
     this.positionChange = this.positionChange.bind(this);
+    this.onSliderDrag = this.onSliderDrag.bind(this);
     this.toggleSliceVisible = this.toggleSliceVisible.bind(this);
     this.updateState = this.updateState.bind(this);
   }
@@ -82,6 +84,12 @@ export default class SlicePanel extends React.Component {
     this.setState(this.oldState);
   }
 
+  onSliderDrag(e) {
+    if (this.props.dataset.autoApply) {
+      dragSlider(e);
+    }
+  }
+
   positionChange(name, value) {
     const { xPosition, yPosition, zPosition } = this.state;
     const pos = {
@@ -150,7 +158,11 @@ export default class SlicePanel extends React.Component {
         needsApply={needsApply}
         moduleName="Slice"
       >
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.xVisible}
@@ -169,7 +181,11 @@ export default class SlicePanel extends React.Component {
             onChange={this.positionChange}
           />
         </div>
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.yVisible}
@@ -188,7 +204,11 @@ export default class SlicePanel extends React.Component {
             onChange={this.positionChange}
           />
         </div>
-        <div className={style.line}>
+        <div
+          className={style.line}
+          onMouseDown={this.onSliderDrag}
+          onTouchStart={this.onSliderDrag}
+        >
           <ToggleButton
             alwaysOn
             value={this.state.zVisible}
@@ -12,6 +12,7 @@ import {
   updateThresholdRange,
   updateThresholdBy,
   getState,
+  previewThreshold,
 } from '../../client';
 
 export default class ThresholdPanel extends React.Component {
@@ -23,6 +24,7 @@ export default class ThresholdPanel extends React.Component {
       rangeMax: props.dataset.data.arrays[0].range[1],
     };
     this.state = Object.assign({}, this.oldState);
+    this.state.preview = null;
 
     this.onApply = this.onApply.bind(this);
     this.onReset = this.onReset.bind(this);
@@ -30,6 +32,7 @@ export default class ThresholdPanel extends React.Component {
     this.setThresholdRangeMax = this.setThresholdRangeMax.bind(this);
     this.updateThresholdBy = this.updateThresholdBy.bind(this);
     this.updateState = this.updateState.bind(this);
+    this.updatePreview = this.updatePreview.bind(this);
   }
 
   componentDidMount() {
@@ -55,6 +58,14 @@ export default class ThresholdPanel extends React.Component {
     this.setState(this.oldState);
   }
 
+  updatePreview(arrayIndex, min, max) {
+    // Share of the values kept, estimated from the histogram of the import
+    const array = this.props.dataset.data.arrays[arrayIndex];
+    previewThreshold(array.name, array.location, min, max, (preview) =>
+      this.setState({ preview })
+    );
+  }
+
   setThresholdRangeMin(name, min) {
     const newState = {
       rangeMin: min,
@@ -65,6 +76,7 @@ export default class ThresholdPanel extends React.Component {
       newState.rangeMax = min;
     }
     this.setState(newState);
+    this.updatePreview(this.state.currentArrayIndex, min, newState.rangeMax);
 
     if (this.props.dataset.autoApply) {
       updateThresholdRange(min, newState.rangeMax);
@@ -81,6 +93,7 @@ export default class ThresholdPanel extends React.Component {
       newState.rangeMin = max;
     }
     this.setState(newState);
+    this.updatePreview(this.state.currentArrayIndex, newState.rangeMin, max);
 
     if (this.props.dataset.autoApply) {
       updateThresholdRange(newState.rangeMin, max);
@@ -91,6 +104,7 @@ export default class ThresholdPanel extends React.Component {
     this.props.dataset.data.arrays.forEach((array, idx) => {
       if (array.name === field) {
         this.setState({ currentArrayIndex: idx, applyDone: false });
+        this.updatePreview(idx, this.state.rangeMin, this.state.rangeMax);
       }
     });
     if (this.props.dataset.autoApply) {
@@ -117,6 +131,11 @@ export default class ThresholdPanel extends React.Component {
       rangeMin: newState.rangeMin,
       rangeMax: newState.rangeMax,
     });
+    this.updatePreview(
+      currentArrayIndex,
+      newState.rangeMin,
+      newState.rangeMax
+    );
   }
 
   render() {
@@ -167,6 +186,12 @@ export default class ThresholdPanel extends React.Component {
             value={this.state.rangeMax}
             onChange={this.setThresholdRangeMax}
           />
+          {this.state.preview ? (
+            <div className={style.preview}>
+              About {Math.round(this.state.preview.fraction * 100)}% of the
+              values in range
+            </div>
+          ) : null}
         </div>
       </AbstractPanel>
     );
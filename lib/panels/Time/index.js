@@ -6,8 +6,8 @@ import style from 'LightVizStyle/TimePanel.mcss';
 
 import {
   updateTime,
-  playTime,
-  stopTime,
+  playAnimation,
+  pauseAnimation,
   addTimeListener,
   removeTimeListener,
 } from '../../client';
@@ -122,16 +122,22 @@ export default class TimePanel extends React.Component {
   }
 
   play() {
+    // The server steps through time on its own and publishes each frame
     if (!this.playing) {
       this.playing = true;
-      playTime();
+      playAnimation();
     }
   }
 
   stop() {
     this.playing = false;
-    stopTime();
-    this.forceUpdate();
+    pauseAnimation((state) => {
+      if (state.index !== undefined) {
+        this.setTimeIdx(state.index);
+      } else {
+        this.forceUpdate();
+      }
+    });
   }
 
   render() {
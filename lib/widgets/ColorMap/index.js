@@ -13,6 +13,7 @@ import {
   listColorMapImages,
   setColorMapRange,
   setColorMapRangeToDataRange,
+  setColorMapRangeToPercentiles,
 } from '../../client';
 
 import {
@@ -49,6 +50,7 @@ export default class ColorMap extends React.Component {
     this.setRangeToDataRangeOverTime = this.setRangeToDataRangeOverTime.bind(
       this
     );
+    this.setRangeToPercentiles = this.setRangeToPercentiles.bind(this);
     this.setPreset = this.setPreset.bind(this);
     this.setRange = this.setRange.bind(this);
     this.updateActiveArray = this.updateActiveArray.bind(this);
@@ -128,6 +130,20 @@ export default class ColorMap extends React.Component {
     this.setState({ rangeMin: min, rangeMax: max });
   }
 
+  setRangeToPercentiles() {
+    // Leaves the outliers out, from the percentiles computed at import
+    setColorMapRangeToPercentiles(
+      this.props.dataset.data.arrays[this.state.currentArray].name,
+      'p1',
+      'p99',
+      (range) => {
+        if (Array.isArray(range)) {
+          this.rangeUpdatedByServer(range);
+        }
+      }
+    );
+  }
+
   setPreset(name) {
     this.setState({ currentColorMap: name });
     setColorMapPreset(
@@ -266,6 +282,15 @@ export default class ColorMap extends React.Component {
           onScaleRangeOverTime={this.setRangeToDataRangeOverTime}
           pieceWiseHeight={150}
         />
+        {this.props.dataset.data.arrays[this.state.currentArray].percentiles ? (
+          <div
+            className={style.percentileRange}
+            onClick={this.setRangeToPercentiles}
+          >
+            <i className={style.percentileButton} />
+            Scale range to the 1st - 99th percentiles
+          </div>
+        ) : null}
       </CollapsibleWidget>
     );
   }
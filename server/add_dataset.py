@@ -1,8 +1,76 @@
 import os
+import sys
 import json
+import glob
+import hashlib
+import time
 import shutil
+import sqlite3
+import tempfile
+import traceback
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy
+    from vtkmodules.util.numpy_support import vtk_to_numpy
+except ImportError:
+    numpy = None
 
 from paraview import simple
+from vtkmodules.vtkCommonDataModel import vtkDataObject, vtkCompositeDataSet
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+
+from light_viz_thumbnails import ThumbnailRenderer
+from light_viz_catalog import openCatalog, updateCatalogEntry
+
+# Where the range of an array came from while scanning, from cheapest to most
+# expensive: reader meta-data (no read), data information (reader executes but
+# ranges are gathered server side) and a full walk of the data object.
+SCAN_PATHS = ['metadata', 'datainformation', 'full']
+
+# How the source file ends up in the data directory. 'inplace' registers the
+# source path without creating anything next to index.json.
+INGEST_MODES = ['copy', 'hardlink', 'reflink', 'symlink', 'inplace']
+
+# Statistics stored next to the range of each array by the full scan
+HISTOGRAM_BINS = 256
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+# Histograms and percentiles are estimated from a weighted sample of the
+# values, bounded per array so that memory does not grow with the dataset
+MAX_STATISTICS_SAMPLES = 1 << 20
+MIN_BLOCK_SAMPLES = 1024
+
+# Downsampling factors of the levels built next to large image data
+PYRAMID_FACTORS = [2, 4, 8]
+
+# VTK XML formats used when converting, all written in raw appended binary
+# mode with block compression so each array is one compressed blob at a
+# known offset
+CONVERSION_EXTENSIONS = {
+    'vtkImageData': 'vti',
+    'vtkStructuredPoints': 'vti',
+    'vtkUniformGrid': 'vti',
+    'vtkRectilinearGrid': 'vtr',
+    'vtkStructuredGrid': 'vts',
+    'vtkPolyData': 'vtp',
+    'vtkUnstructuredGrid': 'vtu',
+    'vtkMultiBlockDataSet': 'vtm',
+}
+COMPRESSORS = ['LZ4', 'ZLib', 'LZMA', 'None']
+
+# Shared by the per-block range computations, numpy releases the GIL while
+# reducing so threads are enough to use every core
+_statisticsPool = None
+
+# Linux ioctl cloning a whole file on copy-on-write filesystems (btrfs, xfs...)
+FICLONE = 0x40049409
 
 def humanReadableSize(size):
     suffixes = ['', 'K', 'M', 'G', 'T', 'P'] # We don't support data files in exobytes
@@ -44,15 +112,229 @@ def loadArrayData(data, location, arrayMap):
             else:
                 arrayMap[array.GetName()] = getArrayInformation(array, location)
 
-def loadArrayDataMultiBlock(dataset, pointArrayMap, cellArrayMap):
+def getStatisticsPool():
+    global _statisticsPool
+    if _statisticsPool is None:
+        _statisticsPool = ThreadPool(multiprocessing.cpu_count())
+    return _statisticsPool
+
+def getLeafDataSets(dataset):
+    if not dataset.IsA('vtkCompositeDataSet'):
+        return [(0, dataset)]
+    leaves = []
+    it = dataset.NewIterator()
+    it.InitTraversal()
+    while not it.IsDoneWithTraversal():
+        leaves.append((it.GetCurrentFlatIndex(), it.GetCurrentDataObject()))
+        it.GoToNextItem()
+    return leaves
+
+def getBlockTree(dataset, index=0):
+    # Same layout and flat indices as LightVizDatasets.getBlockStructure
+    # builds from the composite data information
+    output = []
+    if dataset.IsA('vtkMultiBlockDataSet'):
+        count = dataset.GetNumberOfBlocks()
+    elif dataset.IsA('vtkMultiPieceDataSet'):
+        count = dataset.GetNumberOfPieces()
+    else:
+        return output, index
+    for i in range(count):
+        name = None
+        if dataset.HasMetaData(i) and dataset.GetMetaData(i).Has(vtkCompositeDataSet.NAME()):
+            name = dataset.GetMetaData(i).Get(vtkCompositeDataSet.NAME())
+        index += 1
+        myIndex = index
+        children = []
+        child = dataset.GetBlock(i) if dataset.IsA('vtkMultiBlockDataSet') else None
+        if child is not None:
+            children, index = getBlockTree(child, index)
+        output.append({'name': name, 'children': children, 'flatindex': myIndex})
+    return output, index
+
+def updateBlockStats(blocks, flatIndex, leaf, ranges):
+    stats = blocks.get(flatIndex)
+    if stats is None:
+        stats = blocks[flatIndex] = {
+            'bounds': None,
+            'numberOfCells': 0,
+            'numberOfPoints': 0,
+            'memorySize': 0,
+            'arrays': [],
+        }
+    # Bounds and ranges cover every timestep scanned, sizes are the largest seen
+    stats['bounds'] = unionBounds(stats['bounds'], [ x for x in leaf.GetBounds()])
+    stats['numberOfCells'] = max(stats['numberOfCells'], leaf.GetNumberOfCells())
+    stats['numberOfPoints'] = max(stats['numberOfPoints'], leaf.GetNumberOfPoints())
+    stats['memorySize'] = max(stats['memorySize'], leaf.GetActualMemorySize())
+    arrays = dict([ ((a['location'], a['name']), a) for a in stats['arrays'] ])
+    for arrayInfo, sample, weight in ranges:
+        blockArray = arrays.get((arrayInfo['location'], arrayInfo['name']))
+        if blockArray is None:
+            stats['arrays'].append({
+                'name': arrayInfo['name'],
+                'location': arrayInfo['location'],
+                'range': arrayInfo['range'],
+            })
+        else:
+            blockArray['range'] = [ min(arrayInfo['range'][0], blockArray['range'][0]),
+                                    max(arrayInfo['range'][1], blockArray['range'][1])]
+
+def sampleValues(values, maxSamples):
+    stride = max(1, -(-values.shape[0] // maxSamples))
+    sample = numpy.array(values[::stride], dtype=numpy.float64)
+    return sample[~numpy.isnan(sample)], stride
+
+def computeFieldRanges(data, location, maxSamples=None):
+    ranges = []
+    for i in range(data.GetNumberOfArrays()):
+        array = data.GetArray(i)
+        if not array:
+            continue
+        dimension = array.GetNumberOfComponents()
+        values = None
+        if numpy is not None and array.GetNumberOfTuples() > 0:
+            try:
+                # Zero-copy view on the VTK buffer
+                values = vtk_to_numpy(array)
+            except Exception:
+                values = None
+        sample = None
+        weight = 1
+        if values is None:
+            arrayRange = [ x for x in array.GetRange(0 if dimension == 1 else -1)]
+        else:
+            if dimension > 1:
+                values = numpy.sqrt(numpy.einsum('ij,ij->i', values, values, dtype=numpy.float64))
+            # VTK ignores NaN when computing ranges, so do we
+            arrayRange = [ float(numpy.nanmin(values)), float(numpy.nanmax(values))]
+            if maxSamples:
+                sample, weight = sampleValues(values, maxSamples)
+        ranges.append(({
+            'name': array.GetName(),
+            'label': array.GetName(),
+            'dimension': dimension,
+            'range': arrayRange,
+            'location': location,
+        }, sample, weight))
+    return ranges
+
+def computeBlockRanges(block, maxSamples=None):
+    return computeFieldRanges(block.GetPointData(), 'POINTS', maxSamples) + computeFieldRanges(block.GetCellData(), 'CELLS', maxSamples)
+
+def newStatistics():
+    return { 'values': numpy.empty(0), 'keys': numpy.empty(0), 'pending': [], 'pendingCount': 0,
+             'count': 0, 'total': 0.0, 'timeRanges': {} }
+
+def compactStatistics(stats):
+    # Weighted reservoir (Efraimidis-Spirakis): every value is kept with a
+    # probability proportional to the weight it stands for, and only the
+    # MAX_STATISTICS_SAMPLES largest keys stay
+    if not stats['pending']:
+        return
+    values = numpy.concatenate([stats['values']] + [ chunk for chunk, keys in stats['pending'] ])
+    keys = numpy.concatenate([stats['keys']] + [ keys for chunk, keys in stats['pending'] ])
+    if len(values) > MAX_STATISTICS_SAMPLES:
+        keep = numpy.argpartition(keys, -MAX_STATISTICS_SAMPLES)[-MAX_STATISTICS_SAMPLES:]
+        values = values[keep]
+        keys = keys[keep]
+    stats['values'] = values
+    stats['keys'] = keys
+    stats['pending'] = []
+    stats['pendingCount'] = 0
+    stats['count'] = len(values)
+
+def addStatisticsSample(statistics, key, sample, weight):
+    stats = statistics.setdefault(key, newStatistics())
+    if not len(sample):
+        return
+    # log(u) / w orders like u ** (1 / w), u in (0, 1]
+    keys = numpy.log(1.0 - numpy.random.random_sample(len(sample))) / weight
+    stats['pending'].append((sample, keys))
+    stats['pendingCount'] += len(sample)
+    stats['total'] += len(sample) * weight
+    # Merged in batches so each value is handled a bounded number of times
+    if stats['pendingCount'] > MAX_STATISTICS_SAMPLES:
+        compactStatistics(stats)
+    else:
+        stats['count'] = len(stats['values']) + stats['pendingCount']
+
+def recordTimestepRanges(statistics, stepMaps, timeIndex):
+    for location in stepMaps:
+        for name, info in stepMaps[location].items():
+            stats = statistics.setdefault((location, name), newStatistics())
+            stats['timeRanges'][timeIndex] = info['range']
+
+def weightedPercentiles(values, weights, percentiles):
+    order = numpy.argsort(values)
+    cumulative = numpy.cumsum(weights[order])
+    return numpy.interp(numpy.array(percentiles, dtype=numpy.float64) / 100.0 * cumulative[-1], cumulative, values[order])
+
+def finalizeStatistics(arrayMaps, statistics, timestepCount):
+    for (location, name), stats in statistics.items():
+        info = arrayMaps[location].get(name)
+        if info is None:
+            continue
+
+        if stats['timeRanges']:
+            timeRanges = info.get('timeRanges', [])
+            timeRanges += [None] * (timestepCount - len(timeRanges))
+            for idx, timeRange in stats['timeRanges'].items():
+                timeRanges[idx] = timeRange
+            info['timeRanges'] = timeRanges
+
+        # All NaN or empty arrays have no usable range to bin
+        if not stats['count'] or not numpy.all(numpy.isfinite(info['range'])):
+            continue
+        compactStatistics(stats)
+        # Each kept value stands for an equal share of what was sampled
+        values = [ stats['values'] ]
+        weights = [ numpy.full(len(stats['values']), stats['total'] / len(stats['values'])) ]
+        if 'histogram' in info:
+            # Fold what a previous import saw back in as weighted bin centers
+            edges = numpy.linspace(info['histogram']['range'][0], info['histogram']['range'][1], len(info['histogram']['counts']) + 1)
+            values.append((edges[:-1] + edges[1:]) * 0.5)
+            weights.append(numpy.array(info['histogram']['counts'], dtype=numpy.float64))
+        values = numpy.concatenate(values)
+        weights = numpy.concatenate(weights)
+
+        counts, _ = numpy.histogram(values, bins=HISTOGRAM_BINS, range=(info['range'][0], info['range'][1]), weights=weights)
+        info['histogram'] = {
+            'range': info['range'],
+            'counts': [ int(round(c)) for c in counts ],
+        }
+        percentileValues = weightedPercentiles(values, weights, PERCENTILES)
+        info['percentiles'] = dict([ ('p%d' % p, float(v)) for p, v in zip(PERCENTILES, percentileValues) ])
+
+def loadArrayDataMultiBlock(dataset, pointArrayMap, cellArrayMap, statistics=None, blocks=None):
     if dataset is None:
         return
-    if dataset.GetClassName() == "vtkMultiBlockDataSet":
-        for i in range(dataset.GetNumberOfBlocks()):
-            loadArrayDataMultiBlock(dataset.GetBlock(i), pointArrayMap, cellArrayMap)
+    if numpy is None and blocks is None:
+        if dataset.GetClassName() == "vtkMultiBlockDataSet":
+            for i in range(dataset.GetNumberOfBlocks()):
+                loadArrayDataMultiBlock(dataset.GetBlock(i), pointArrayMap, cellArrayMap)
+        else:
+            loadArrayData(dataset.GetPointData(), 'POINTS', pointArrayMap)
+            loadArrayData(dataset.GetCellData(), 'CELLS', cellArrayMap)
+        return
+
+    leaves = getLeafDataSets(dataset)
+    maxSamples = None
+    if statistics is not None and leaves:
+        maxSamples = max(MIN_BLOCK_SAMPLES, MAX_STATISTICS_SAMPLES // len(leaves))
+    if numpy is not None and len(leaves) > 1:
+        blockRanges = getStatisticsPool().map(lambda leaf: computeBlockRanges(leaf[1], maxSamples), leaves)
     else:
-        loadArrayData(dataset.GetPointData(), 'POINTS', pointArrayMap)
-        loadArrayData(dataset.GetCellData(), 'CELLS', cellArrayMap)
+        blockRanges = [ computeBlockRanges(leaf, maxSamples) for flatIndex, leaf in leaves ]
+    # Blocks come back in order so the array order matches the serial walk
+    arrayMaps = { 'POINTS': pointArrayMap, 'CELLS': cellArrayMap }
+    for (flatIndex, leaf), ranges in zip(leaves, blockRanges):
+        for arrayInfo, sample, weight in ranges:
+            mergeArrayInformation(arrayInfo, arrayMaps[arrayInfo['location']])
+            if sample is not None and len(sample):
+                addStatisticsSample(statistics, (arrayInfo['location'], arrayInfo['name']), sample, weight)
+        if blocks is not None:
+            updateBlockStats(blocks, flatIndex, leaf, ranges)
 
 def unionBounds(b1, b2):
     if b1 is None:
@@ -77,65 +359,572 @@ def getBounds(ds):
         bounds = ds.GetBounds()
     return bounds
 
-def importDataset(dataDir, datafile, description, autoApply=True):
+def mergeArrayInformation(arrayInfo, arrayMap):
+    info = arrayMap.get(arrayInfo['name'])
+    if info is None:
+        arrayMap[arrayInfo['name']] = dict(arrayInfo)
+    else:
+        info['range'] = [ min(arrayInfo['range'][0], info['range'][0]),
+                          max(arrayInfo['range'][1], info['range'][1])]
+
+def recordScanPath(scanPaths, key, path):
+    if key not in scanPaths or SCAN_PATHS.index(path) > SCAN_PATHS.index(scanPaths[key]):
+        scanPaths[key] = path
+
+def getMetaDataInformation(reader):
+    # Only RequestInformation runs here, so whatever we find did not require
+    # reading any heavy data
+    reader.UpdatePipelineInformation()
+    info = reader.GetClientSideObject().GetOutputInformation(0)
+    arrays = { 'POINTS': {}, 'CELLS': {} }
+    for location, key in [('POINTS', vtkDataObject.POINT_DATA_VECTOR()),
+                          ('CELLS', vtkDataObject.CELL_DATA_VECTOR())]:
+        if not info.Has(key):
+            continue
+        fieldInfos = info.Get(key)
+        for i in range(fieldInfos.GetNumberOfInformationObjects()):
+            fieldInfo = fieldInfos.GetInformationObject(i)
+            if not fieldInfo.Has(vtkDataObject.FIELD_NAME()) or not fieldInfo.Has(vtkDataObject.FIELD_RANGE()):
+                continue
+            dimension = 1
+            if fieldInfo.Has(vtkDataObject.FIELD_NUMBER_OF_COMPONENTS()):
+                dimension = fieldInfo.Get(vtkDataObject.FIELD_NUMBER_OF_COMPONENTS())
+            # FIELD_RANGE describes a single component while we record the
+            # magnitude range of vectors
+            if dimension != 1:
+                continue
+            name = fieldInfo.Get(vtkDataObject.FIELD_NAME())
+            arrays[location][name] = {
+                'name': name,
+                'label': name,
+                'dimension': dimension,
+                'range': [ x for x in fieldInfo.Get(vtkDataObject.FIELD_RANGE())],
+                'location': location,
+            }
+
+    bounds = None
+    sddp = vtkStreamingDemandDrivenPipeline
+    if info.Has(vtkDataObject.BOUNDING_BOX()):
+        bounds = [ x for x in info.Get(vtkDataObject.BOUNDING_BOX())]
+    elif info.Has(sddp.WHOLE_EXTENT()) and info.Has(vtkDataObject.ORIGIN()) and info.Has(vtkDataObject.SPACING()):
+        extent = info.Get(sddp.WHOLE_EXTENT())
+        origin = info.Get(vtkDataObject.ORIGIN())
+        spacing = info.Get(vtkDataObject.SPACING())
+        bounds = []
+        for i in range(3):
+            lo = origin[i] + extent[2 * i] * spacing[i]
+            hi = origin[i] + extent[2 * i + 1] * spacing[i]
+            bounds += [min(lo, hi), max(lo, hi)]
+    if bounds is not None and (bounds[0] > bounds[1] or bounds[2] > bounds[3] or bounds[4] > bounds[5]):
+        bounds = None
+
+    return arrays, bounds
+
+def loadArrayDataInformation(reader, arrayMaps, scanPaths, names=None):
+    fields = { 'POINTS': reader.PointData, 'CELLS': reader.CellData }
+    fallback = { 'POINTS': [], 'CELLS': [] }
+    for location in fields:
+        available = fields[location].keys()
+        for name in (available if names is None else names[location]):
+            if name not in available:
+                fallback[location].append(name)
+                continue
+            array = fields[location][name]
+            if name in arrayMaps[location]:
+                updateArrayBoundsForTimestep(array, arrayMaps[location])
+            else:
+                arrayMaps[location][name] = getArrayInformation(array, location)
+            recordScanPath(scanPaths, (location, name), 'datainformation')
+
+    if fallback['POINTS'] or fallback['CELLS']:
+        ds = reader.GetClientSideObject().GetOutputDataObject(0)
+        fullMaps = { 'POINTS': {}, 'CELLS': {} }
+        loadArrayDataMultiBlock(ds, fullMaps['POINTS'], fullMaps['CELLS'])
+        for location in fallback:
+            for name in fallback[location]:
+                if name in fullMaps[location]:
+                    mergeArrayInformation(fullMaps[location][name], arrayMaps[location])
+                    recordScanPath(scanPaths, (location, name), 'full')
+
+def scanTimestepsFromMetaData(reader, timesteps, arrayMaps, bounds, scanPaths, firstIndex=0):
+    # Reader meta-data only describes the file or step the reader points at
+    # (the XML readers behind a .pvd series...), never the whole series, so it
+    # stands for the first timestep and the others go through data information
+    for idx, t in enumerate(timesteps):
+        names = None
+        if firstIndex + idx == 0:
+            metaArrays, metaBounds = getMetaDataInformation(reader)
+            names = {}
+            for location in arrayMaps:
+                for arrayInfo in metaArrays[location].values():
+                    mergeArrayInformation(arrayInfo, arrayMaps[location])
+                    recordScanPath(scanPaths, (location, arrayInfo['name']), 'metadata')
+                names[location] = [ name for name in arrayMaps[location] if name not in metaArrays[location] ]
+            if metaBounds is not None:
+                bounds = unionBounds(bounds, metaBounds)
+                if not names['POINTS'] and not names['CELLS']:
+                    continue
+        reader.UpdatePipeline(t)
+        bounds = unionBounds(bounds, reader.GetDataInformation().GetBounds())
+        loadArrayDataInformation(reader, arrayMaps, scanPaths, names)
+
+    return bounds
+
+def scanTimesteps(reader, timesteps, arrayMaps, bounds, scan, scanPaths, statistics=None, firstIndex=0, blocks=None):
+    if scan == 'metadata':
+        return scanTimestepsFromMetaData(reader, timesteps, arrayMaps, bounds, scanPaths, firstIndex)
+    for idx, t in enumerate(timesteps):
+        reader.UpdatePipeline(t)
+        ds = reader.GetClientSideObject().GetOutputDataObject(0)
+        stepMaps = { 'POINTS': {}, 'CELLS': {} }
+        loadArrayDataMultiBlock(ds, stepMaps['POINTS'], stepMaps['CELLS'], statistics, blocks)
+        for location in stepMaps:
+            for arrayInfo in stepMaps[location].values():
+                mergeArrayInformation(arrayInfo, arrayMaps[location])
+        if statistics is not None:
+            recordTimestepRanges(statistics, stepMaps, firstIndex + idx)
+        newBounds = getBounds(ds)
+        bounds = unionBounds(bounds, newBounds)
+    return bounds
+
+def hashFile(datafile, chunkSize=1024 * 1024):
+    # Only called when the size or mtime changed, the whole file is read so
+    # that a same-size rewrite in place is never mistaken for the old content
+    digest = hashlib.sha1()
+    with open(datafile, 'rb') as fp:
+        chunk = fp.read(chunkSize)
+        while chunk:
+            digest.update(chunk)
+            chunk = fp.read(chunkSize)
+    return digest.hexdigest()
+
+def fingerprintFile(datafile, previous=None):
+    stat = os.stat(datafile)
+    fingerprint = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'hash': None,
+    }
+    if previous and previous.get('size') == fingerprint['size'] and previous.get('mtime') == fingerprint['mtime']:
+        fingerprint['hash'] = previous.get('hash')
+    else:
+        fingerprint['hash'] = hashFile(datafile)
+    return fingerprint
+
+def isSameSource(previous, fingerprint):
+    return previous is not None and previous.get('size') == fingerprint['size'] and previous.get('hash') == fingerprint['hash']
+
+def isGrownTimeSeries(previous, timesteps):
+    previousTimesteps = [ t['value'] for t in previous['data']['time'] ]
+    return 0 < len(previousTimesteps) < len(timesteps) and timesteps[:len(previousTimesteps)] == previousTimesteps
+
+def readIndexFile(filedir):
+    with open(os.path.join(filedir, 'index.json'), 'r') as fp:
+        return json.load(fp)
+
+def writeIndexFile(filedir, result):
+    # Write to a temporary file next to the target and rename it into place so
+    # the server never picks up a partially written index.json
+    fd, tmpPath = tempfile.mkstemp(prefix='.index.json.', dir=filedir)
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(result, fp)
+        # mkstemp creates the file private (0600), give it the permissions a
+        # plain open() would so a server running as another user can read it
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmpPath, 0o666 & ~umask)
+        getattr(os, 'replace', os.rename)(tmpPath, os.path.join(filedir, 'index.json'))
+    except:
+        os.remove(tmpPath)
+        raise
+
+def reflinkFile(src, dst):
+    if fcntl is None:
+        raise OSError('reflink is not supported on this platform')
+    with open(src, 'rb') as srcFp:
+        with open(dst, 'wb') as dstFp:
+            fcntl.ioctl(dstFp.fileno(), FICLONE, srcFp.fileno())
+
+def ingestFile(datafile, filedir, ingest='copy'):
+    basename = os.path.basename(datafile)
+    if ingest == 'inplace':
+        return os.path.abspath(datafile), ingest
+    target = os.path.join(filedir, basename)
+    if os.path.abspath(datafile) == os.path.abspath(target):
+        return basename, 'inplace'
+    if os.path.lexists(target):
+        # Links from a previous import already point to the right content
+        if ingest in ['hardlink', 'symlink'] and os.path.exists(target) and os.path.samefile(datafile, target):
+            return basename, ingest
+        os.remove(target)
+
+    try:
+        if ingest == 'hardlink':
+            os.link(datafile, target)
+        elif ingest == 'reflink':
+            reflinkFile(datafile, target)
+        elif ingest == 'symlink':
+            os.symlink(os.path.abspath(datafile), target)
+    except (OSError, IOError, AttributeError) as e:
+        print('%s: %s ingestion failed (%s), falling back to copy' % (basename, ingest, e))
+        if os.path.lexists(target):
+            os.remove(target)
+        ingest = 'copy'
+
+    if ingest == 'copy':
+        shutil.copyfile(datafile, target)
+    return basename, ingest
+
+def buildPyramid(reader, filedir, basename, factors):
+    # Levels are written as .vti files and recorded from the finest to the
+    # coarsest so the server can pick one without opening the original
+    extent = [ x for x in reader.GetDataInformation().GetExtent()]
+    levels = []
+    for factor in factors:
+        subset = simple.ExtractSubset(Input=reader)
+        subset.VOI = extent
+        subset.SampleRateI = factor
+        subset.SampleRateJ = factor
+        subset.SampleRateK = factor
+        fileName = '%s.level%d.vti' % (os.path.splitext(basename)[0], factor)
+        filePath = os.path.join(filedir, fileName)
+        simple.SaveData(filePath, proxy=subset)
+        levels.append({
+            'factor': factor,
+            'file': fileName,
+            'extent': [ x for x in subset.GetDataInformation().GetExtent()],
+            'size': humanReadableSize(os.path.getsize(filePath)),
+        })
+        simple.Delete(subset)
+    return levels
+
+def getPathSize(filePath):
+    # Multiblock files keep their pieces in a directory named after them
+    size = os.path.getsize(filePath)
+    piecesDir = os.path.splitext(filePath)[0]
+    if os.path.isdir(piecesDir):
+        for root, dirs, files in os.walk(piecesDir):
+            size += sum([ os.path.getsize(os.path.join(root, f)) for f in files ])
+    return size
+
+def convertDataset(reader, filedir, basename, compressor):
+    ds = reader.GetClientSideObject().GetOutputDataObject(0)
+    extension = CONVERSION_EXTENSIONS.get(ds.GetClassName())
+    if extension is None:
+        return None
+    fileName = '%s.converted.%s' % (os.path.splitext(basename)[0], extension)
+    filePath = os.path.join(filedir, fileName)
+    simple.SaveData(filePath, proxy=reader, DataMode='Appended', EncodeAppendedData=0, CompressorType=compressor)
+
+    start = time.time()
+    converted = simple.OpenDataFile(filePath)
+    converted.UpdatePipeline()
+    loadTime = time.time() - start
+    simple.Delete(converted)
+
+    return {
+        'file': fileName,
+        'format': extension,
+        'compressor': compressor,
+        'size': humanReadableSize(getPathSize(filePath)),
+        'loadTime': loadTime,
+    }
+
+def checkUnchanged(dataDir, datafile):
+    filedir = os.path.join(dataDir, os.path.basename(datafile))
+    if not os.path.exists(os.path.join(filedir, 'index.json')):
+        return None, None, False
+    previous = readIndexFile(filedir)
+    fingerprint = fingerprintFile(datafile, previous.get('source'))
+    unchanged = isSameSource(previous.get('source'), fingerprint)
+    if unchanged and previous['source'] != fingerprint:
+        # Touched but identical, remember the new mtime so we do not hash it again
+        previous['source'] = fingerprint
+        writeIndexFile(filedir, previous)
+    return previous, fingerprint, unchanged
+
+def importDataset(dataDir, datafile, description, autoApply=True, scan='full', update=False, ingest='copy', pyramid=None, convert=None, checked=None):
     if not os.path.exists(datafile):
-        print "Data file \"%s\" does not exist" % datafile
-        return
+        print("Data file \"%s\" does not exist" % datafile)
+        return None
     basename = os.path.basename(datafile)
     filedir = os.path.join(dataDir, basename)
-    os.mkdir(filedir)
-    shutil.copyfile(datafile, os.path.join(filedir, basename))
-    result = {
-        'name': basename,
-        'size': humanReadableSize(os.path.getsize(datafile)),
-        'description': description,
-        'thumbnails': [],
-        'autoApply': autoApply,
-        'data': {
-            'file': basename,
-            'bounds': None,
-            'arrays': [],
-            'time': [],
-        },
-    }
-    reader = simple.OpenDataFile(datafile)
-    rep = simple.Show(reader)
-    rep.Visibility = 1
-    view = simple.Render()
-    view.ViewSize = [400, 400]
 
-    ds = reader.GetClientSideObject().GetOutputDataObject(0)
-    pointArrayMap = {}
-    cellArrayMap = {}
-    loadArrayDataMultiBlock(ds, pointArrayMap, cellArrayMap)
-    bounds = getBounds(ds)
+    previous = None
+    source = None
+    if update:
+        # Batch imports pass the result of their own check so that a changed
+        # file is hashed only once
+        previous, source, unchanged = checked or checkUnchanged(dataDir, datafile)
+        if unchanged:
+            print('%s: unchanged, skipping' % basename)
+            return previous
+    if source is None:
+        source = fingerprintFile(datafile)
 
+    if not (update and os.path.isdir(filedir)):
+        os.mkdir(filedir)
+    fileEntry, ingest = ingestFile(datafile, filedir, ingest)
+    reader = simple.OpenDataFile(datafile)
+    timesteps = []
     if 'TimestepValues' in reader.ListProperties() and len(reader.TimestepValues) > 0:
-        for idx in range(len(reader.TimestepValues)):
-            t = reader.TimestepValues[idx]
-            result['data']['time'].append({ 'idx': idx, 'value': t })
-            reader.UpdatePipeline(t)
-            ds = reader.GetClientSideObject().GetOutputDataObject(0)
-            loadArrayDataMultiBlock(ds, pointArrayMap, cellArrayMap)
-            newBounds = getBounds(ds)
-            bounds = unionBounds(bounds, newBounds)
+        timesteps = [ t for t in reader.TimestepValues ]
+    scanPaths = {}
+    # Histograms and percentiles need the values, so only the full scan computes them
+    statistics = {} if numpy is not None and scan == 'full' else None
 
-    result['data']['arrays'] = pointArrayMap.values() + cellArrayMap.values()
-    result['data']['bounds'] = bounds
+    if previous and isGrownTimeSeries(previous, timesteps):
+        # Only scan the new timesteps and merge them into what we already know
+        result = previous
+        firstNew = len(result['data']['time'])
+        arrayMaps = { 'POINTS': {}, 'CELLS': {} }
+        for arrayInfo in result['data']['arrays']:
+            arrayMaps[arrayInfo['location']][arrayInfo['name']] = arrayInfo
+        blocks = None
+        if 'blockStats' in result['data']:
+            blocks = dict([ (int(idx), stats) for idx, stats in result['data']['blockStats'].items() ])
+        bounds = scanTimesteps(reader, timesteps[firstNew:], arrayMaps, result['data']['bounds'], scan, scanPaths, statistics, firstNew, blocks)
+        result['size'] = humanReadableSize(source['size'])
+        result['data']['time'] += [ { 'idx': idx, 'value': timesteps[idx] } for idx in range(firstNew, len(timesteps)) ]
+        result['data']['arrays'] = list(arrayMaps['POINTS'].values()) + list(arrayMaps['CELLS'].values())
+        result['data']['bounds'] = bounds
+        result['data']['file'] = fileEntry
+        if blocks is not None:
+            result['data']['blockStats'] = blocks
+        print('%s: merged %d new timesteps' % (basename, len(timesteps) - firstNew))
+    else:
+        result = {
+            'name': basename,
+            'size': humanReadableSize(source['size']),
+            'description': description if description or not previous else previous['description'],
+            'thumbnails': [],
+            'autoApply': autoApply,
+            'data': {
+                'file': fileEntry,
+                'bounds': None,
+                'arrays': [],
+                'time': [],
+            },
+        }
+        # Time the first execution for the conversion report
+        start = time.time()
+        reader.UpdatePipeline()
+        originalLoadTime = time.time() - start
 
-    tnpath = os.path.join(filedir, 'thumbnail0.png')
-    simple.SaveScreenshot(tnpath, view)
-    result['thumbnails'].append('thumbnail0.png')
+        pointArrayMap = {}
+        cellArrayMap = {}
+        arrayMaps = { 'POINTS': pointArrayMap, 'CELLS': cellArrayMap }
+        ds = reader.GetClientSideObject().GetOutputDataObject(0)
+        # Per-block index so the server can answer block queries without
+        # executing the reader
+        blocks = None
+        if ds.IsA('vtkCompositeDataSet'):
+            blocks = {}
+            result['data']['blocks'] = getBlockTree(ds)[0]
+        if scan == 'metadata':
+            loadArrayDataInformation(reader, arrayMaps, scanPaths)
+            bounds = reader.GetDataInformation().GetBounds()
+            if blocks is not None:
+                loadArrayDataMultiBlock(ds, {}, {}, None, blocks)
+        else:
+            # The timestep scan below gathers statistics for time series
+            loadArrayDataMultiBlock(ds, pointArrayMap, cellArrayMap, None if timesteps else statistics, blocks)
+            bounds = getBounds(ds)
+
+        if timesteps:
+            result['data']['time'] = [ { 'idx': idx, 'value': t } for idx, t in enumerate(timesteps) ]
+            bounds = scanTimesteps(reader, timesteps, arrayMaps, bounds, scan, scanPaths, statistics, 0, blocks)
+        if blocks is not None:
+            result['data']['blockStats'] = blocks
+
+        result['data']['arrays'] = list(pointArrayMap.values()) + list(cellArrayMap.values())
+        result['data']['bounds'] = bounds
+
+        if pyramid:
+            if not reader.GetClientSideObject().GetOutputDataObject(0).IsA('vtkImageData'):
+                print('%s: not image data, no pyramid built' % basename)
+            elif timesteps:
+                print('%s: pyramids are not built for time series' % basename)
+            else:
+                result['data']['levels'] = buildPyramid(reader, filedir, basename, pyramid)
+
+        if convert:
+            converted = None
+            if timesteps:
+                print('%s: time series are not converted' % basename)
+            else:
+                converted = convertDataset(reader, filedir, basename, convert)
+                if converted is None:
+                    print('%s: no fast-read format for this data type, not converted' % basename)
+            if converted:
+                converted['originalLoadTime'] = originalLoadTime
+                result['data']['converted'] = converted
+                print('%s: converted to %s (%s), load time %.2fs -> %.2fs' % (
+                    basename, converted['file'], converted['size'], originalLoadTime, converted['loadTime']))
 
-    with open(os.path.join(filedir, 'index.json'), 'w') as fp:
-        json.dump(result, fp)
+        # Offscreen render with default display settings and a reset camera
+        snapshot = { 'representations': [ (reader, {}) ], 'camera': None, 'background': None }
+        variants = ThumbnailRenderer().render(snapshot, filedir, 'thumbnail0.png')
+        result['thumbnails'].append('thumbnail0.png')
+        result['thumbnailVariants'] = { 'thumbnail0.png': variants }
+        if previous:
+            result['thumbnails'] += [ t for t in previous['thumbnails'] if t != 'thumbnail0.png' ]
+            for t, v in previous.get('thumbnailVariants', {}).items():
+                if t != 'thumbnail0.png':
+                    result['thumbnailVariants'][t] = v
+
+    if statistics:
+        finalizeStatistics(arrayMaps, statistics, len(timesteps))
+
+    for (location, name), path in sorted(scanPaths.items()):
+        print('%s: %s array "%s" scanned from %s' % (basename, location, name, path))
+
+    result['data']['ingest'] = ingest
+    result['source'] = source
+    writeIndexFile(filedir, result)
+    # sqlite serializes the concurrent writers of a batch import, the server
+    # rebuilds what is missing from index.json if the catalog is not writable
+    try:
+        catalog = openCatalog(dataDir)
+        try:
+            updateCatalogEntry(catalog, dataDir, filedir, result)
+        finally:
+            catalog.close()
+    except (sqlite3.Error, OSError) as e:
+        print('%s: catalog not updated (%s)' % (basename, e))
+    return result
+
+def collectDataFiles(directory=None, pattern=None, manifest=None, description='', autoApply=False):
+    entries = []
+    if directory:
+        for fileName in sorted(os.listdir(directory)):
+            filePath = os.path.join(directory, fileName)
+            if not fileName.startswith('.') and os.path.isfile(filePath):
+                entries.append({ 'file': filePath })
+    if pattern:
+        for filePath in sorted(glob.glob(pattern)):
+            if os.path.isfile(filePath):
+                entries.append({ 'file': filePath })
+    if manifest:
+        # The manifest is a JSON list of file paths or of objects with a
+        # "file" key and optional "description"/"autoApply" overrides
+        with open(manifest, 'r') as fp:
+            for item in json.load(fp):
+                if not isinstance(item, dict):
+                    item = { 'file': item }
+                filePath = item['file']
+                if not os.path.isabs(filePath):
+                    filePath = os.path.join(os.path.dirname(os.path.abspath(manifest)), filePath)
+                entry = dict(item)
+                entry['file'] = filePath
+                entries.append(entry)
+    # The same file listed twice is imported once
+    unique = []
+    seen = set()
+    for entry in entries:
+        realPath = os.path.realpath(entry['file'])
+        if realPath not in seen:
+            seen.add(realPath)
+            unique.append(entry)
+    for entry in unique:
+        entry.setdefault('description', description)
+        entry.setdefault('autoApply', autoApply)
+    return unique
+
+def findNameConflicts(entries):
+    # Datasets are named after their file, different files with the same
+    # name would race on the same dataset directory
+    files = {}
+    for entry in entries:
+        files.setdefault(os.path.basename(entry['file']), []).append(entry['file'])
+    return dict([ (name, paths) for name, paths in files.items() if len(paths) > 1 ])
+
+def _importWorker(task):
+    dataDir, entry, options = task
+    start = time.time()
+    summary = {
+        'file': entry['file'],
+        'size': os.path.getsize(entry['file']) if os.path.exists(entry['file']) else 0,
+        'status': 'ok',
+        'error': None,
+    }
+    try:
+        checked = None
+        if options.get('update') and os.path.exists(entry['file']):
+            checked = checkUnchanged(dataDir, entry['file'])
+        if checked and checked[2]:
+            summary['status'] = 'unchanged'
+        elif importDataset(dataDir, entry['file'], entry['description'], entry['autoApply'], checked=checked, **options) is None:
+            summary['status'] = 'missing'
+    except Exception:
+        summary['status'] = 'failed'
+        summary['error'] = traceback.format_exc()
+    summary['time'] = time.time() - start
+    return summary
+
+def importBatch(dataDir, entries, jobs=None, **options):
+    conflicts = findNameConflicts(entries)
+    if conflicts:
+        for name, paths in sorted(conflicts.items()):
+            print('Several files would be imported as "%s": %s' % (name, ', '.join(paths)))
+        print('Nothing imported, rename or import these files separately')
+        return []
+    tasks = [ (dataDir, entry, options) for entry in entries ]
+    start = time.time()
+    summaries = []
+    # Each import gets its own process so that pipeline proxies and render
+    # windows from one dataset never accumulate in the next one
+    pool = multiprocessing.Pool(processes=jobs, maxtasksperchild=1)
+    try:
+        for summary in pool.imap_unordered(_importWorker, tasks):
+            summaries.append(summary)
+            print('[%d/%d] %-8s %8.2fs %6s  %s' % (len(summaries), len(tasks), summary['status'],
+                                                 summary['time'], humanReadableSize(summary['size']),
+                                                 summary['file']))
+            if summary['error']:
+                sys.stdout.write(summary['error'])
+            sys.stdout.flush()
+    finally:
+        pool.close()
+        pool.join()
+
+    elapsed = time.time() - start
+    succeeded = [ s for s in summaries if s['status'] == 'ok' ]
+    unchanged = [ s for s in summaries if s['status'] == 'unchanged' ]
+    totalTime = sum([ s['time'] for s in summaries ])
+    totalSize = sum([ s['size'] for s in succeeded ])
+    print('Imported %d/%d datasets (%s, %d unchanged) in %.2fs wall time, %.2fs import time' % (
+        len(succeeded), len(summaries), humanReadableSize(totalSize), len(unchanged), elapsed, totalTime))
+    return summaries
 
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='A script to import data files into lightviz')
     parser.add_argument('--data-dir', help='Lightviz data directory to import to', dest='dataDir', required=True)
-    parser.add_argument('--file', help='file to import', dest='file', required=True)
-    parser.add_argument('--description', help='description of the dataset', dest='description', required=True)
+    sources = parser.add_mutually_exclusive_group(required=True)
+    sources.add_argument('--file', help='file to import', dest='file')
+    sources.add_argument('--dir', help='import every file of that directory as a dataset', dest='directory')
+    sources.add_argument('--glob', help='import every file matching that pattern as a dataset', dest='pattern')
+    sources.add_argument('--manifest', help='JSON list of files (or {"file", "description", "autoApply"} objects) to import', dest='manifest')
+    parser.add_argument('--description', help='description of the dataset', dest='description', default='')
     parser.add_argument('--autoApply', action='store_true', default=False, help='Add this option to enable automatic Apply calls for the dataset', dest='autoApply')
+    parser.add_argument('--jobs', type=int, default=None, help='number of parallel import processes for batch imports (default: number of cores)', dest='jobs')
+    parser.add_argument('--scan', choices=['full', 'metadata'], default='full', help='how array ranges and bounds are gathered over the timesteps: "full" reads every timestep, "metadata" uses data information, and reader meta-data for the first timestep, instead of reading every value', dest='scan')
+    parser.add_argument('--update', action='store_true', default=False, help='re-import datasets that already exist: unchanged files are skipped and time series that grew only get their new timesteps scanned', dest='update')
+    parser.add_argument('--ingest', choices=INGEST_MODES, default='copy', help='how the data file is brought into the data directory, falling back to copy when the filesystem does not support it', dest='ingest')
+    parser.add_argument('--pyramid', nargs='?', const=','.join([ str(f) for f in PYRAMID_FACTORS ]), default=None, help='build downsampled levels of image data, optionally with a comma separated list of factors (default: %(const)s)', dest='pyramid')
+    parser.add_argument('--convert', nargs='?', const='LZ4', default=None, choices=COMPRESSORS, help='also store the data as compressed appended VTK XML and load that instead, optionally choosing the compressor (default: %(const)s)', dest='convert')
     args = parser.parse_args()
-    importDataset(args.dataDir, args.file, args.description, args.autoApply)
+    options = {
+        'scan': args.scan,
+        'update': args.update,
+        'ingest': args.ingest,
+        'pyramid': [ int(f) for f in args.pyramid.split(',') ] if args.pyramid else None,
+        'convert': args.convert,
+    }
+    if args.file:
+        importDataset(args.dataDir, args.file, args.description, args.autoApply, **options)
+    else:
+        entries = collectDataFiles(args.directory, args.pattern, args.manifest, args.description, args.autoApply)
+        importBatch(args.dataDir, entries, args.jobs, **options)
@@ -0,0 +1,84 @@
+import time
+
+from paraview import simple
+
+# Compare the former clipX -> clipY -> clipZ chain of LightVizClip with the
+# single box clip on update time and memory held by the filter outputs.
+
+def getInput(fileName, size):
+    if fileName:
+        source = simple.OpenDataFile(fileName)
+    else:
+        # Wavelet turned into an unstructured grid, like most user meshes
+        wavelet = simple.Wavelet(WholeExtent=[-size, size, -size, size, -size, size])
+        source = simple.MergeBlocks(Input=wavelet)
+    source.UpdatePipeline()
+    return source
+
+def getCenters(bounds, steps):
+    centers = []
+    for step in range(steps):
+        t = 0.25 + 0.5 * step / max(steps - 1, 1)
+        centers.append([ bounds[2 * i] + t * (bounds[2 * i + 1] - bounds[2 * i]) for i in range(3) ])
+    return centers
+
+def createChain(source, center):
+    clips = []
+    inpt = source
+    for normal in [[1, 0, 0], [0, 1, 0], [0, 0, 1]]:
+        clip = simple.Clip(Input=inpt)
+        clip.ClipType.Origin = center
+        clip.ClipType.Normal = normal
+        clips.append(clip)
+        inpt = clip
+    return clips
+
+def moveChain(clips, center):
+    for clip in clips:
+        clip.ClipType.Origin = center
+
+def createBox(source, center):
+    bounds = source.GetDataInformation().GetBounds()
+    clip = simple.Clip(Input=source)
+    clip.ClipType = 'Box'
+    clip.ClipType.UseReferenceBounds = 0
+    clip.ClipType.Rotation = [0, 0, 0]
+    clip.InsideOut = 1
+    moveBox([clip], center, bounds)
+    return [clip]
+
+def moveBox(clips, center, bounds):
+    # Same region as the chain without inside out: [center, max] on each axis
+    pad = [ max((bounds[2 * i + 1] - bounds[2 * i]) * 0.01, 1e-6) for i in range(3) ]
+    clips[0].ClipType.Position = center
+    clips[0].ClipType.Length = [ bounds[2 * i + 1] + pad[i] - center[i] for i in range(3) ]
+
+def run(name, clips, move, centers):
+    times = []
+    for center in centers:
+        move(clips, center)
+        start = time.time()
+        clips[-1].UpdatePipeline()
+        times.append(time.time() - start)
+    memory = sum([ clip.GetDataInformation().GetMemorySize() for clip in clips ])
+    cells = clips[-1].GetDataInformation().GetNumberOfCells()
+    print('%-6s %8.3fs avg %8.3fs max %10d KB held %10d cells' % (
+        name, sum(times) / len(times), max(times), memory, cells))
+    for clip in reversed(clips):
+        simple.Delete(clip)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark the box clip of LightVizClip against three chained clips')
+    parser.add_argument('--file', help='data file to clip (default: an unstructured wavelet)', dest='file')
+    parser.add_argument('--size', type=int, default=50, help='half size of the wavelet extent', dest='size')
+    parser.add_argument('--steps', type=int, default=5, help='number of clip positions to time', dest='steps')
+    args = parser.parse_args()
+
+    source = getInput(args.file, args.size)
+    bounds = source.GetDataInformation().GetBounds()
+    print('input: %d cells, %d KB' % (source.GetDataInformation().GetNumberOfCells(), source.GetDataInformation().GetMemorySize()))
+    centers = getCenters(bounds, args.steps)
+
+    run('chain', createChain(source, centers[0]), moveChain, centers)
+    run('box', createBox(source, centers[0]), lambda clips, center: moveBox(clips, center, bounds), centers)
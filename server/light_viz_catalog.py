@@ -0,0 +1,94 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+# Consolidated summary of every index.json of a data directory, written by
+# add_dataset.py and kept in sync by the server. It lives outside the data
+# directory: creating its journal there would change the directory mtime the
+# server relies on to notice added or removed datasets.
+CATALOG_DIR = os.environ.get('LIGHT_VIZ_CATALOG_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'light-viz'))
+
+# Summary fields that can be requested from the listing
+CATALOG_FIELDS = ['name', 'description', 'size', 'bytes', 'date', 'autoApply', 'arrays', 'timesteps', 'thumbnail', 'path']
+SORT_FIELDS = { 'name': 'name', 'size': 'bytes', 'date': 'date' }
+
+def getCatalogPath(dataDir):
+    key = hashlib.sha1(os.path.abspath(dataDir).encode('utf-8')).hexdigest()
+    return os.path.join(CATALOG_DIR, 'catalog-%s.db' % key)
+
+def openCatalog(dataDir=None):
+    # Without a data directory the catalog lives in memory
+    path = ':memory:'
+    if dataDir:
+        path = getCatalogPath(dataDir)
+        if not os.path.isdir(CATALOG_DIR):
+            os.makedirs(CATALOG_DIR)
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS datasets ('
+        'path TEXT PRIMARY KEY, name TEXT, description TEXT, size TEXT, bytes INTEGER, '
+        'date REAL, autoApply INTEGER, arrays TEXT, timesteps INTEGER, thumbnail TEXT)')
+    connection.commit()
+    return connection
+
+def summarizeDataset(path, metadata, date):
+    thumbnails = metadata.get('thumbnails', [])
+    return {
+        'path': path,
+        'name': metadata['name'],
+        'description': metadata.get('description', ''),
+        'size': metadata.get('size', ''),
+        'bytes': metadata.get('source', {}).get('size', 0),
+        'date': date,
+        'autoApply': bool(metadata.get('autoApply')),
+        'arrays': [ array['name'] for array in metadata['data'].get('arrays', []) ],
+        'timesteps': len(metadata['data'].get('time', [])),
+        'thumbnail': thumbnails[0] if thumbnails else None,
+    }
+
+def updateCatalogEntry(connection, dataDir, filedir, metadata, commit=True):
+    path = os.path.relpath(filedir, dataDir)
+    date = os.stat(os.path.join(filedir, 'index.json')).st_mtime
+    summary = summarizeDataset(path, metadata, date)
+    connection.execute(
+        'INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (path, summary['name'], summary['description'], summary['size'], summary['bytes'],
+         date, 1 if summary['autoApply'] else 0, json.dumps(summary['arrays']),
+         summary['timesteps'], summary['thumbnail']))
+    if commit:
+        connection.commit()
+
+def removeCatalogEntries(connection, keep):
+    paths = [ row[0] for row in connection.execute('SELECT path FROM datasets') ]
+    for path in paths:
+        if path not in keep:
+            connection.execute('DELETE FROM datasets WHERE path = ?', (path,))
+    connection.commit()
+
+def queryCatalog(connection, offset=0, limit=50, search=None, sortBy='name', descending=False, fields=None):
+    if sortBy not in SORT_FIELDS:
+        raise ValueError('Cannot sort datasets by %s' % sortBy)
+    fields = [ f for f in (fields or CATALOG_FIELDS) if f in CATALOG_FIELDS ]
+
+    where = ''
+    params = []
+    if search:
+        pattern = '%%%s%%' % search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        where = " WHERE name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\'"
+        params = [pattern, pattern]
+
+    total = connection.execute('SELECT COUNT(*) FROM datasets' + where, params).fetchone()[0]
+    order = ' ORDER BY %s %s, name' % (SORT_FIELDS[sortBy], 'DESC' if descending else 'ASC')
+    rows = connection.execute('SELECT %s FROM datasets%s%s LIMIT ? OFFSET ?' % (', '.join(fields), where, order),
+                              params + [limit, offset])
+
+    datasets = []
+    for row in rows:
+        item = dict(zip(fields, row))
+        if 'arrays' in item:
+            item['arrays'] = json.loads(item['arrays'])
+        if 'autoApply' in item:
+            item['autoApply'] = bool(item['autoApply'])
+        datasets.append(item)
+    return { 'total': total, 'offset': offset, 'limit': limit, 'datasets': datasets }
@@ -1,5 +1,5 @@
 
-import os, sys, logging, types, inspect, traceback, logging, re, json, base64
+import os, sys, logging, types, inspect, traceback, logging, re, json, base64, collections, math, bisect, sqlite3
 from time import time
 
 # import RPC annotation
@@ -11,10 +11,145 @@ import paraview
 from paraview import simple, servermanager
 from paraview.web import protocols as pv_protocols
 
-from vtkmodules.vtkCommonCore import vtkUnsignedCharArray, vtkCollection
-from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkCommonCore import vtkUnsignedCharArray, vtkCollection, vtkSMPTools
+from vtkmodules.vtkCommonDataModel import vtkImageData, vtkDataObject
+from vtkmodules.vtkCommonExecutionModel import vtkSpanSpace
+from vtkmodules.vtkFiltersCore import vtkFlyingEdges3D, vtkContour3DLinearGrid
 from vtkmodules.vtkWebCore import vtkDataEncoder
 
+from light_viz_thumbnails import ThumbnailRenderer, snapshotView
+from light_viz_catalog import openCatalog, updateCatalogEntry, removeCatalogEntries, queryCatalog
+
+try:
+    from wslink import schedule_callback
+except:
+    # Older wslink runs on twisted
+    from twisted.internet import reactor
+
+    def schedule_callback(delay, callback, *args):
+        return reactor.callLater(delay, callback, *args)
+
+def isBuiltinSession():
+    # Client side objects only hold the data when the data server runs in
+    # this process, not behind --ds-host
+    connection = servermanager.ActiveConnection
+    return connection is not None and not connection.IsRemote()
+
+# Minimum seconds between two renders
+RENDER_INTERVAL = 1.0 / 30
+
+# Approximate number of cells of the decimated input used while dragging
+INTERACTIVE_CELLS = 1 << 18
+# Inputs that can be decimated by striding, anything else is resampled
+STRUCTURED_CLASSES = ['vtkImageData', 'vtkUniformGrid', 'vtkRectilinearGrid', 'vtkStructuredGrid']
+# Axis aligned inputs that the clip crops to a sub-extent instead of clipping
+SUBEXTENT_CLASSES = ['vtkImageData', 'vtkUniformGrid', 'vtkRectilinearGrid']
+
+# Inputs contoured through a span space index, grids use templates instead
+SPAN_SPACE_CLASSES = ['vtkUnstructuredGrid', 'vtkPolyData']
+# Approximate bytes per cell of a span space (cell range tuple and sorted id)
+SPAN_SPACE_CELL_BYTES = 24
+# Contours of the very same input data before an index is worth building
+SPAN_SPACE_MIN_RUNS = 2
+
+# Contour algorithms: threaded flying edges for volumes, threaded linear cell
+# contouring for unstructured grids and the ParaView filter for the rest
+CONTOUR_PATHS = ['flyingEdges', 'linearGrid', 'generic']
+
+# =============================================================================
+#
+# Render scheduling
+#
+# =============================================================================
+
+class RenderScheduler(object):
+    """Collect render and UpdateEvent requests from every module and perform
+    them at most once per RENDER_INTERVAL from the event loop."""
+
+    def __init__(self, interval=RENDER_INTERVAL):
+        self.interval = interval
+        self.views = []
+        self.application = None
+        self.scheduled = False
+        self.lastRender = 0
+        self.stats = { 'renderRequested': 0, 'updateRequested': 0, 'performed': 0 }
+
+    def render(self, view=None):
+        self.stats['renderRequested'] += 1
+        if view not in self.views:
+            self.views.append(view)
+        self.schedule()
+
+    def update(self, application):
+        # UpdateEvent makes the image delivery render and push the views
+        self.stats['updateRequested'] += 1
+        self.application = application
+        self.schedule()
+
+    def schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            schedule_callback(max(0, self.lastRender + self.interval - time()), self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        self.lastRender = time()
+        if self.application:
+            self.application.InvokeEvent('UpdateEvent')
+            self.stats['performed'] += 1
+        else:
+            for view in self.views:
+                if view:
+                    simple.Render(view)
+                else:
+                    simple.Render()
+                self.stats['performed'] += 1
+        self.views = []
+        self.application = None
+
+    def getStats(self):
+        stats = dict(self.stats)
+        stats['requested'] = stats['renderRequested'] + stats['updateRequested']
+        stats['pending'] = self.scheduled
+        return stats
+
+renderScheduler = RenderScheduler()
+
+class ParameterCoalescer(object):
+    """Latest-wins application of slider driven parameters: a value waits for
+    the next event loop iteration and is replaced if a newer one arrives for
+    the same RPC in the meantime."""
+
+    def __init__(self):
+        self.pending = collections.OrderedDict()
+        self.scheduled = False
+        self.applied = {}
+        self.skipped = {}
+
+    def submit(self, name, callback, *args):
+        if name in self.pending:
+            self.skipped[name] = self.skipped.get(name, 0) + 1
+        self.pending[name] = (callback, args)
+        if not self.scheduled:
+            self.scheduled = True
+            schedule_callback(0, self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        while self.pending:
+            name, (callback, args) = self.pending.popitem(last=False)
+            self.applied[name] = self.applied.get(name, 0) + 1
+            callback(*args)
+
+    def getStats(self):
+        return {
+            'applied': dict(self.applied),
+            'skipped': dict(self.skipped),
+            'totalSkipped': sum(self.skipped.values()),
+        }
+
+parameterCoalescer = ParameterCoalescer()
+
 try:
     # PV 5.6
     from vtkmodules.vtkPVClientServerCoreRendering import vtkPVRenderView
@@ -129,6 +264,50 @@ def simpleColorBy(rep=None, value=None):
     # rep.RescaleTransferFunctionToDataRange()
 
 
+# =============================================================================
+#
+# Batched state updates
+#
+# =============================================================================
+
+class LightVizBatch(pv_protocols.ParaViewWebProtocol):
+
+    def __init__(self, protocols):
+        super(LightVizBatch, self).__init__()
+        # RPC name => bound method of the module exposing it
+        self.methods = {}
+        for protocol in protocols:
+            for name in dir(protocol):
+                method = getattr(protocol, name, None)
+                for uri in getattr(method, '_wslinkuris', []):
+                    self.methods[uri['uri']] = method
+
+    @exportRpc("light.viz.batch.besteffort")
+    def applyBatch(self, operations):
+        """Apply a list of { 'rpc': name, 'args': [...] } operations in order.
+        Renders requested along the way are coalesced into a single one.
+
+        Best effort, not transactional: when an operation raises, the ones
+        before it stay applied and 'applied' tells how many there were."""
+        for index, operation in enumerate(operations):
+            if operation.get('rpc') not in self.methods:
+                # Nothing is applied when the batch is malformed
+                return { 'applied': 0, 'results': [], 'error': { 'index': index, 'rpc': operation.get('rpc'), 'message': 'Unknown RPC' } }
+
+        results = []
+        for index, operation in enumerate(operations):
+            try:
+                results.append(self.methods[operation['rpc']](*operation.get('args', [])))
+            except Exception as e:
+                traceback.print_exc()
+                renderScheduler.update(self.getApplication())
+                return { 'applied': index, 'results': results, 'error': { 'index': index, 'rpc': operation['rpc'], 'message': str(e) } }
+
+        # Slider parameters of the batch are applied now rather than later
+        parameterCoalescer.flush()
+        renderScheduler.update(self.getApplication())
+        return { 'applied': len(results), 'results': results, 'error': None }
+
 # =============================================================================
 #
 # Dataset management
@@ -137,14 +316,40 @@ def simpleColorBy(rep=None, value=None):
 
 class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
 
-    def __init__(self, data_directory):
+    def __init__(self, data_directory, coarseFirst=False, poolSize=2, poolMemory=1024, timeCacheMemory=512, timePrefetch=2):
         super(LightVizDatasets, self).__init__()
         self.basedir = data_directory
+        self.coarseFirst = coarseFirst
+        # Previously opened datasets kept loaded (hidden), least recently
+        # used first, within a count and a memory budget (in KB)
+        self.readerPool = collections.OrderedDict()
+        self.readerPoolSize = poolSize
+        self.readerPoolBudget = poolMemory * 1024
+        self.readerPoolStats = { 'hits': 0, 'misses': 0, 'evictions': 0, 'evictedMemory': 0 }
+        self.loadTask = None
+        self.loadTaskCount = 0
+        # Timesteps of the active dataset kept in memory (in KB) and
+        # read ahead of the current one
+        self.timeCache = None
+        self.readAheadCache = None
+        self.timeCacheBudget = timeCacheMemory * 1024
+        self.timePrefetch = timePrefetch
+        self.timeStepMemory = 0
+        self.timeCacheStats = { 'hits': 0, 'misses': 0, 'prefetched': 0 }
+        self.prefetchGeneration = 0
+        self.playback = None
+        # Decimated stand-in for the dataset while a position is dragged
+        self.interactiveInput = None
+        self.interactiveSources = []
+        self.dragging = False
+        self.activeLevel = 0
         self.datasetMap = {}
         self.dataset = None
         self.reader = None
         self.context = None
         self.extractBlocks = None
+        self.contextRep = None
+        self.datasetRep = None
         self.datasets = []
         self.activeMeta = None
         self.colormaps = {}
@@ -153,34 +358,162 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         self.colorBy = ('__SOLID__', '__SOLID__')
         self.dataListeners = []
         self.view = simple.GetRenderView()
-        for filePath in os.listdir(self.basedir):
-            indexPath = os.path.join(self.basedir, filePath, 'index.json')
-            if os.path.exists(indexPath):
-                with open(indexPath, 'r') as fd:
-                    metadata = json.loads(fd.read())
-                    self.datasets.append(metadata)
-                    self.datasetMap[metadata['name']] = { 'path':  os.path.dirname(indexPath), 'meta': metadata }
+        self.thumbnailRenderer = ThumbnailRenderer(scheduler=schedule_callback)
+        # Parsed index.json files keyed by dataset directory, each entry is
+        # only re-read when its index file changes
+        self.catalog = {}
+        self.catalogDirs = []
+        self.catalogMtime = None
+        # Rows of datasets removed while the server was down are only pruned
+        # by the first sync
+        self.catalogSynced = False
+        try:
+            self.catalogDb = openCatalog(self.basedir)
+        except:
+            self.catalogDb = openCatalog()
+        self.refreshCatalog()
 
 
     def addListener(self, dataChangedInstance):
         self.dataListeners.append(dataChangedInstance)
 
+    def notifyInputChanged(self):
+        # Same dataset, different data (level, blocks, reader)
+        for l in self.dataListeners:
+            if hasattr(l, 'inputChanged'):
+                l.inputChanged()
+
     def getInput(self):
         return self.dataset
 
-    @exportRpc("light.viz.dataset.list")
-    def listDatasets(self):
+    def getDataFilePath(self, datasetName, fileName):
+        info = self.datasetMap[datasetName]
+        filePath = os.path.join(info['path'], fileName)
+        # Symlinked and in-place datasets are opened from their real location
+        # so readers can find their companion files
+        if info['meta']['data'].get('ingest') in ['symlink', 'inplace']:
+            filePath = os.path.realpath(filePath)
+        return filePath
+
+    def getDataFiles(self, datasetName, level=0):
+        meta = self.datasetMap[datasetName]['meta']
+        if level > 0:
+            return [ self.getDataFilePath(datasetName, meta['data']['levels'][level - 1]['file']) ]
+        if 'converted' in meta['data']:
+            return [ self.getDataFilePath(datasetName, meta['data']['converted']['file']) ]
+        fileNames = meta['data']['file']
+        if type(fileNames) is not list:
+            fileNames = [ fileNames ]
+        return [ self.getDataFilePath(datasetName, fileName) for fileName in fileNames ]
+
+    def replaceReader(self, newReader):
+        # Reconnect whatever consumes the current reader (dataset
+        # representation, module filters) so the modules keep their state
+        oldReader = self.reader
+        consumers = []
+        for i in range(oldReader.SMProxy.GetNumberOfConsumers()):
+            consumer = servermanager._getPyProxy(oldReader.SMProxy.GetConsumerProxy(i))
+            if consumer and 'Input' in consumer.ListProperties() and consumer not in consumers:
+                consumers.append(consumer)
+        for consumer in consumers:
+            consumer.Input = newReader
+        if self.dataset is oldReader:
+            self.dataset = newReader
+        self.reader = newReader
+        simple.Delete(oldReader)
+        self.notifyInputChanged()
+
+    def refreshCatalog(self):
+        # The data directory is only listed again when entries were added or
+        # removed, otherwise a stat per index.json is enough
+        mtime = os.stat(self.basedir).st_mtime
+        if mtime != self.catalogMtime:
+            self.catalogMtime = mtime
+            self.catalogDirs = os.listdir(self.basedir)
+
         self.datasets = []
         self.datasetMap = {}
-        for filePath in os.listdir(self.basedir):
-            indexPath = os.path.join(self.basedir, filePath, 'index.json')
-            if os.path.exists(indexPath):
-                with open(indexPath, 'r') as fd:
-                    metadata = json.loads(fd.read())
-                    self.datasets.append(metadata)
-                    self.datasetMap[metadata['name']] = { 'path':  os.path.dirname(indexPath), 'meta': metadata }
+        changed = []
+        removed = False
+        for filePath in self.catalogDirs:
+            path = os.path.join(self.basedir, filePath)
+            indexPath = os.path.join(path, 'index.json')
+            try:
+                stat = os.stat(indexPath)
+            except OSError:
+                removed = self.catalog.pop(path, None) is not None or removed
+                continue
+            stamp = (stat.st_mtime, stat.st_size)
+            entry = self.catalog.get(path)
+            if entry is None or entry['stamp'] != stamp:
+                try:
+                    with open(indexPath, 'r') as fd:
+                        metadata = json.loads(fd.read())
+                except:
+                    # Partially written or broken index, keep the last good one
+                    if entry is None:
+                        continue
+                    metadata = entry['meta']
+                entry = { 'stamp': stamp, 'meta': metadata }
+                self.catalog[path] = entry
+                changed.append(path)
+            self.datasets.append(entry['meta'])
+            self.datasetMap[entry['meta']['name']] = { 'path': path, 'meta': entry['meta'] }
+
+        # Drop what disappeared from the directory
+        dirs = set(self.catalogDirs)
+        for path in list(self.catalog.keys()):
+            if os.path.basename(path) not in dirs:
+                del self.catalog[path]
+                removed = True
+        self.syncCatalog(changed, removed)
+
+    def syncCatalog(self, paths, removed=False):
+        # The listing above never depends on the database, only the paged
+        # queries do
+        try:
+            for path in paths:
+                updateCatalogEntry(self.catalogDb, self.basedir, path, self.catalog[path]['meta'], False)
+            if removed or not self.catalogSynced:
+                removeCatalogEntries(self.catalogDb, [ os.path.relpath(path, self.basedir) for path in self.catalog ])
+            self.catalogDb.commit()
+            self.catalogSynced = True
+        except sqlite3.OperationalError:
+            # Read-only catalog (created by another user...), continue with
+            # one in memory filled from the parsed index files
+            traceback.print_exc()
+            self.catalogDb = openCatalog()
+            for path in self.catalog:
+                updateCatalogEntry(self.catalogDb, self.basedir, path, self.catalog[path]['meta'], False)
+            self.catalogDb.commit()
+            self.catalogSynced = True
+
+    def writeIndex(self, path, metadata):
+        indexPath = os.path.join(path, 'index.json')
+        with open(indexPath, 'w') as fd:
+            fd.write(json.dumps(metadata, indent=4, separators=(',', ': ')))
+        # Our own write, keep the in-memory entry instead of re-parsing it
+        stat = os.stat(indexPath)
+        self.catalog[path] = { 'stamp': (stat.st_mtime, stat.st_size), 'meta': metadata }
+        self.syncCatalog([path])
+
+    @exportRpc("light.viz.dataset.list")
+    def listDatasets(self):
+        self.refreshCatalog()
         return self.datasets
 
+    @exportRpc("light.viz.dataset.catalog")
+    def queryDatasets(self, offset=0, limit=50, search=None, sortBy='name', descending=False, fields=None):
+        # Dataset summaries only, the full metadata comes from
+        # light.viz.dataset.info or light.viz.dataset.load
+        self.refreshCatalog()
+        return queryCatalog(self.catalogDb, offset, limit, search, sortBy, descending, fields)
+
+    @exportRpc("light.viz.dataset.info")
+    def getDatasetInfo(self, datasetName):
+        self.refreshCatalog()
+        return self.datasetMap[datasetName]['meta']
+
     @exportRpc("light.viz.dataset.thumbnail")
     def getThumbnails(self, datasetName):
         thumbnails = []
@@ -200,78 +533,337 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
     @exportRpc("light.viz.dataset.thumbnail.save")
     def saveThumbnail(self):
         if self.view:
-            size = [x for x in self.view.ViewSize.GetData()]
-            self.view.ViewSize = [400, 400]
-            basePath = self.datasetMap[self.activeMeta['name']]['path']
-            numThumbnails = len(self.activeMeta['thumbnails'])
-            filename = "thumbnail%d.jpg" % (numThumbnails + 1,)
-            filepath = os.path.join(basePath, filename)
-            simple.SaveScreenshot(filepath,self.view)
-            self.activeMeta['thumbnails'].append(filename)
-            indexPath = os.path.join(self.basedir, basePath, 'index.json')
-            with open(indexPath, 'w') as fd:
-                fd.write(json.dumps(self.activeMeta, indent=4, separators=(',', ': ')))
-            self.view.ViewSize = size
-
-    @exportRpc("light.viz.dataset.load")
-    def loadDataset(self, datasetName):
-        if self.dataset:
-            if self.activeMeta is self.datasetMap[datasetName]['meta']:
-                return self.activeMeta
-            simple.Delete(self.reader)
-            if self.extractBlocks:
-                simple.Delete(self.extractBlocks)
-            self.dataset = None
-            self.datasetRep = None
-            self.view = None
-
+            meta = self.activeMeta
+            basePath = self.datasetMap[meta['name']]['path']
+            pending = self.thumbnailRenderer.pending()
+            numThumbnails = len(meta['thumbnails']) + 1
+            filename = "thumbnail%d.jpg" % (numThumbnails,)
+            while os.path.join(basePath, filename) in pending:
+                numThumbnails += 1
+                filename = "thumbnail%d.jpg" % (numThumbnails,)
+
+            # Rendered later in the offscreen thumbnail view, the interactive
+            # view keeps its size
+            def thumbnailReady(fileName, variants):
+                meta['thumbnails'].append(fileName)
+                meta.setdefault('thumbnailVariants', {})[fileName] = variants
+                self.writeIndex(basePath, meta)
+
+            self.thumbnailRenderer.enqueue(snapshotView(self.view), basePath, filename, thumbnailReady)
+            return filename
+
+    def getLoadedMemory(self):
+        memory = self.reader.GetDataInformation().GetMemorySize()
+        memory += self.timeStepMemory * self.getCachedSteps()
         if self.context:
-          simple.Delete(self.reader)
-          self.context = None
-          self.contextRep = None
-
-        self.activeMeta = self.datasetMap[datasetName]['meta']
+            memory += self.context.GetDataInformation().GetMemorySize()
+        return memory
+
+    def suppressTimeSources(self, proxies, suppress):
+        # Hidden pooled readers must not add their timesteps to the scene
+        timeKeeper = simple.GetTimeKeeper()
+        for proxy in proxies:
+            if proxy:
+                servermanager.vtkSMTimeKeeperProxy.SetSuppressTimeSource(timeKeeper.SMProxy, proxy.SMProxy, suppress)
+
+    def poolActiveDataset(self):
+        self.datasetRep.Visibility = 0
+        if self.contextRep:
+            self.contextRep.Visibility = 0
+        self.suppressTimeSources([self.reader, self.context], True)
+        self.readerPool[self.activeMeta['name']] = {
+            'meta': self.activeMeta,
+            'reader': self.reader,
+            'extractBlocks': self.extractBlocks,
+            'dataset': self.dataset,
+            'context': self.context,
+            'level': self.activeLevel,
+            'timeCache': self.timeCache,
+            'readAheadCache': self.readAheadCache,
+            'timeStepMemory': self.timeStepMemory,
+            'memory': self.getLoadedMemory(),
+        }
+        self.evictReaders()
+
+    def deletePoolEntry(self, entry):
+        if entry['extractBlocks']:
+            simple.Delete(entry['extractBlocks'])
+        if entry['timeCache']:
+            simple.Delete(entry['timeCache'])
+        if entry['readAheadCache']:
+            simple.Delete(entry['readAheadCache'])
+        simple.Delete(entry['reader'])
+        if entry['context']:
+            simple.Delete(entry['context'])
+
+    def evictReaders(self):
+        while self.readerPool and (len(self.readerPool) > self.readerPoolSize or
+                                   sum([ e['memory'] for e in self.readerPool.values() ]) > self.readerPoolBudget):
+            name, entry = self.readerPool.popitem(last=False)
+            self.deletePoolEntry(entry)
+            self.readerPoolStats['evictions'] += 1
+            self.readerPoolStats['evictedMemory'] += entry['memory']
+
+    @exportRpc("light.viz.dataset.pool")
+    def getReaderPool(self):
+        pool = {
+            'datasets': [ { 'name': name, 'memory': entry['memory'] } for name, entry in self.readerPool.items() ],
+            'memory': sum([ e['memory'] for e in self.readerPool.values() ]),
+            'budget': self.readerPoolBudget,
+            'size': self.readerPoolSize,
+        }
+        pool.update(self.readerPoolStats)
+        return pool
+
+    def openReaders(self, datasetName):
+        # Create the reader proxies without executing them
+        meta = self.datasetMap[datasetName]['meta']
+        context = None
+        if 'context' in meta['data']:
+          context = simple.OpenDataFile(self.getDataFilePath(datasetName, meta['data']['context']))
+
+        # Open the coarsest level first when asked to, full resolution is
+        # then loaded on demand through light.viz.dataset.level
+        level = 0
+        if self.coarseFirst:
+            level = len(meta['data'].get('levels', []))
+
+        reader = simple.OpenDataFile(self.getDataFiles(datasetName, level))
+        # Not part of the scene until they become the active dataset
+        self.suppressTimeSources([reader, context], True)
+        return { 'reader': reader, 'context': context, 'level': level }
+
+    def deleteReaders(self, readers):
+        for name in ['reader', 'context']:
+            if readers[name]:
+                simple.Delete(readers[name])
+
+    def takePooledReaders(self, datasetName):
+        entry = self.readerPool.pop(datasetName, None)
+        if entry and entry['meta'] is not self.datasetMap[datasetName]['meta']:
+            # index.json changed since it was opened
+            self.deletePoolEntry(entry)
+            self.notifyInputChanged()
+            entry = None
+        if entry:
+            self.readerPoolStats['hits'] += 1
+        else:
+            self.readerPoolStats['misses'] += 1
+        return entry
 
+    def releaseDataset(self):
+        self.resetInteractiveInput()
+        self.poolActiveDataset()
+        self.reader = None
+        self.extractBlocks = None
+        self.dataset = None
+        self.datasetRep = None
+        self.context = None
+        self.contextRep = None
+        self.timeCache = None
+        self.readAheadCache = None
+        self.view = None
 
-        if 'context' in self.activeMeta['data']:
-          self.context = simple.OpenDataFile(os.path.join(self.datasetMap[datasetName]['path'], self.activeMeta['data']['context']))
+    def useReaders(self, datasetName, readers):
+        # Make freshly opened or pooled readers the active dataset
+        self.activeMeta = self.datasetMap[datasetName]['meta']
+        self.reader = readers['reader']
+        self.context = readers['context']
+        self.activeLevel = readers['level']
+        self.prefetchGeneration += 1
+        self.suppressTimeSources([self.reader, self.context], False)
+        if self.context:
           self.contextRep = simple.Show(self.context)
 
-        filesToLoad = []
-        if type(self.activeMeta['data']['file']) is list:
-          for fileName in self.activeMeta['data']['file']:
-            filesToLoad.append(os.path.join(self.datasetMap[datasetName]['path'], fileName))
-        else:
-          filesToLoad.append(os.path.join(self.datasetMap[datasetName]['path'], self.activeMeta['data']['file']))
+        if readers.get('dataset'):
+            self.extractBlocks = readers['extractBlocks']
+            self.dataset = readers['dataset']
+            self.timeCache = readers['timeCache']
+            self.timeStepMemory = readers['timeStepMemory']
+            self.readAheadCache = readers['readAheadCache']
+            return
 
-        self.reader = simple.OpenDataFile(filesToLoad)
         # Have to do this to force the reader to execute and get the data information
         readerRep = simple.Show(self.reader)
         readerRep.Visibility = 0
-        if self.reader.GetDataInformation().DataInformation.GetCompositeDataInformation().GetDataIsComposite() == 1:
-            self.extractBlocks = simple.ExtractBlock(Input = self.reader)
+        source = self.createTimeCache()
+        if 'blocks' in self.activeMeta['data'] or self.reader.GetDataInformation().DataInformation.GetCompositeDataInformation().GetDataIsComposite() == 1:
+            self.extractBlocks = simple.ExtractBlock(Input = source)
             self.dataset = self.extractBlocks
             blocks = self.getBlockStructure()
             while len(blocks[-1]['children']) > 0:
                 blocks = blocks[-1]['children']
             self.extractBlocks.BlockIndices = [ x + 1 for x in range(blocks[-1]['flatindex'])]
         else:
-            self.dataset = self.reader
+            self.dataset = source
+
+    def createTimeCache(self):
+        # Time series are read through caches holding as many timesteps as
+        # fit in the budget, sized from the timestep that was just read
+        self.timeCache = None
+        self.readAheadCache = None
+        self.timeStepMemory = 0
+        steps = len(self.activeMeta['data']['time'])
+        if self.timeCacheBudget <= 0 or steps < 2:
+            return self.reader
+        self.timeStepMemory = max(1, self.reader.GetDataInformation().GetMemorySize())
+        capacity = max(1, min(steps, self.timeCacheBudget // self.timeStepMemory))
+        source = self.reader
+        readAhead = min(2 * self.timePrefetch, capacity - 1)
+        if readAhead > 0:
+            # Prefetching only pulls this cache, the time cache above it (and
+            # everything downstream) keeps its output at the displayed time
+            self.readAheadCache = simple.TemporalCache(Input=self.reader)
+            self.readAheadCache.CacheSize = readAhead
+            source = self.readAheadCache
+        self.timeCache = simple.TemporalCache(Input=source)
+        self.timeCache.CacheSize = max(1, capacity - readAhead)
+        return self.timeCache
+
+    def getCachedSteps(self):
+        steps = 0
+        for cache in [self.timeCache, self.readAheadCache]:
+            if cache:
+                steps += cache.CacheSize
+        return steps
+
+    def getReaderTime(self):
+        # Gathered again without executing anything, tells which timestep
+        # the reader produced last, hence whether the caches had to read
+        self.reader.SMProxy.GetOutputPort(0).InvalidateDataInformation()
+        info = self.reader.GetDataInformation().DataInformation
+        return info.GetTime() if info.GetHasTime() else None
+
+    def schedulePrefetch(self, forward=False, wrap=False):
+        self.prefetchGeneration += 1
+        if not self.readAheadCache:
+            return
+        times = [ t['value'] for t in self.activeMeta['data']['time'] ]
+        current = self.anim.TimeKeeper.Time
+        index = min(range(len(times)), key=lambda i: abs(times[i] - current))
+        # Next steps first, never more than what fits next to the current one
+        order = []
+        for k in range(1, self.timePrefetch + 1):
+            for i in ([index + k] if forward else [index + k, index - k]):
+                if wrap:
+                    i = i % len(times)
+                if i >= 0 and i < len(times) and i != index and times[i] not in order:
+                    order.append(times[i])
+        order = order[:self.readAheadCache.CacheSize]
+        if order:
+            schedule_callback(0, self.prefetchTimestep, self.prefetchGeneration, order)
+
+    def prefetchTimestep(self, generation, times):
+        # One timestep per event loop iteration so RPCs are served in between,
+        # a newer time request or dataset cancels what is left
+        if generation != self.prefetchGeneration or not self.readAheadCache:
+            return
+        t = times.pop(0)
+        readerTime = self.getReaderTime()
+        self.readAheadCache.UpdatePipeline(t)
+        if self.getReaderTime() != readerTime:
+            self.timeCacheStats['prefetched'] += 1
+        if times:
+            schedule_callback(0, self.prefetchTimestep, generation, times)
+
+    def resetInteractiveInput(self):
+        # Consumers first
+        for source in reversed(self.interactiveSources):
+            simple.Delete(source)
+        self.interactiveSources = []
+        self.interactiveInput = None
+
+    def getInteractiveInput(self):
+        # Built on the first drag only, the dataset may never be dragged
+        if self.interactiveInput is None:
+            info = self.dataset.GetDataInformation()
+            cells = info.GetNumberOfCells()
+            if cells <= INTERACTIVE_CELLS:
+                self.interactiveInput = self.dataset
+            elif info.GetDataClassName() in STRUCTURED_CLASSES:
+                # Strided extract, keeps the grid structure
+                stride = int(math.ceil((float(cells) / INTERACTIVE_CELLS) ** (1.0 / 3)))
+                self.interactiveInput = simple.ExtractSubset(Input=self.dataset)
+                self.interactiveInput.SampleRateI = stride
+                self.interactiveInput.SampleRateJ = stride
+                self.interactiveInput.SampleRateK = stride
+                self.interactiveSources = [self.interactiveInput]
+            else:
+                # Unstructured and composite data are resampled on a coarse
+                # grid, which samples cell fields as point fields
+                size = int(round(INTERACTIVE_CELLS ** (1.0 / 3)))
+                resample = simple.ResampleToImage(Input=self.dataset)
+                resample.SamplingDimensions = [size, size, size]
+                self.interactiveInput = resample
+                self.interactiveSources = [resample]
+                cellArrays = [ array['name'] for array in self.activeMeta['data']['arrays'] if array['location'] == 'CELLS' ]
+                if cellArrays:
+                    # Give them back as cell fields so modules contouring or
+                    # coloring by a cell field keep working while dragging
+                    self.interactiveInput = simple.PointDatatoCellData(Input=resample)
+                    self.interactiveInput.PassPointData = 1
+                    self.interactiveInput.ProcessAllArrays = 0
+                    self.interactiveInput.PointDataArraytoProcess = cellArrays
+                    self.interactiveSources.append(self.interactiveInput)
+            if self.interactiveInput is not self.dataset:
+                self.interactiveInput.UpdatePipeline(simple.GetTimeKeeper().Time)
+        return self.interactiveInput
+
+    @exportRpc("light.viz.interaction.drag")
+    def setDragging(self, dragging):
+        # Clip, slice and contour work on the decimated input while dragging
+        # and go back to full resolution on release
+        if self.dataset and dragging != self.dragging:
+            self.dragging = dragging
+            for l in self.dataListeners:
+                if hasattr(l, 'setInteractive'):
+                    l.setInteractive(dragging)
+            renderScheduler.update(self.getApplication())
+        return self.dragging
+
+    @exportRpc("light.viz.render.stats")
+    def getRenderStats(self):
+        return renderScheduler.getStats()
+
+    @exportRpc("light.viz.coalescing.stats")
+    def getCoalescingStats(self):
+        return parameterCoalescer.getStats()
+
+    @exportRpc("light.viz.dataset.time.cache")
+    def getTimeCache(self):
+        stats = {
+            'enabled': self.timeCache is not None,
+            'size': self.timeCache.CacheSize if self.timeCache else 0,
+            'readAhead': self.readAheadCache.CacheSize if self.readAheadCache else 0,
+            'stepMemory': self.timeStepMemory,
+            'memory': self.timeStepMemory * self.getCachedSteps(),
+            'budget': self.timeCacheBudget,
+            'prefetch': self.timePrefetch,
+        }
+        stats.update(self.timeCacheStats)
+        return stats
+
+    def showDataset(self):
+        # Slider values still pending belong to the previous dataset
+        parameterCoalescer.flush()
         self.datasetRep = simple.Show(self.dataset)
         self.datasetRep.Representation = 'Surface'
         self.datasetRep.Visibility = 1
         self.colorBy = ('__SOLID__', '__SOLID__')
         self.updateColorBy(self.colorBy[1], self.colorBy[0])
-        self.view = simple.Render()
+        self.view = simple.GetRenderView()
+        self.view.Update()
         self.view.Background = self.background
 
         # reset the camera
         simple.ResetCamera(self.view)
         self.view.CenterOfRotation = self.view.CameraFocalPoint
-        simple.Render(self.view)
+        renderScheduler.render(self.view)
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
         self.anim = simple.GetAnimationScene()
+        self.playback = None
+        self.dragging = False
 
         # Notify listeners
         for l in self.dataListeners:
@@ -283,21 +875,159 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
             arrName = array['name']
             self.setColormapRange(arrName, arrRange)
 
-        simple.Render(self.view)
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render(self.view)
+        renderScheduler.update(self.getApplication())
 
         return self.activeMeta
 
+    @exportRpc("light.viz.dataset.load")
+    def loadDataset(self, datasetName):
+        self.cancelLoad()
+        if self.dataset:
+            if self.activeMeta is self.datasetMap[datasetName]['meta']:
+                return self.activeMeta
+            self.releaseDataset()
+
+        readers = self.takePooledReaders(datasetName)
+        if not readers:
+            readers = self.openReaders(datasetName)
+        self.useReaders(datasetName, readers)
+        return self.showDataset()
+
+    def getLoadInfo(self, task):
+        info = dict([ (key, task[key]) for key in ['id', 'dataset', 'state', 'progress', 'error'] ])
+        if task['state'] == 'done':
+            info['meta'] = self.activeMeta
+        return info
+
+    @exportRpc("light.viz.dataset.load.async")
+    def loadDatasetAsync(self, datasetName):
+        self.cancelLoad()
+        self.loadTaskCount += 1
+        task = { 'id': self.loadTaskCount, 'dataset': datasetName, 'state': 'loading', 'progress': 0.0, 'error': None }
+
+        if self.activeMeta is self.datasetMap[datasetName]['meta'] or datasetName in self.readerPool:
+            # Nothing to read
+            self.loadDataset(datasetName)
+            task['state'] = 'done'
+            task['progress'] = 1.0
+            info = self.getLoadInfo(task)
+            self.publish('light.viz.dataset.progress', info)
+            return info
+
+        # ParaView proxies are not thread safe, so the readers execute from the
+        # event loop, one per iteration, and RPCs are served in between
+        task['readers'] = self.openReaders(datasetName)
+        task['steps'] = [ task['readers'][name] for name in ['context', 'reader'] if task['readers'][name] ]
+        task['executed'] = 0
+        self.loadTask = task
+        self.publish('light.viz.dataset.progress', self.getLoadInfo(task))
+        schedule_callback(0, self.executeLoadStep, task)
+        return self.getLoadInfo(task)
+
+    def getProgressHandler(self):
+        # Progress of whatever executes for the session, in builtin and
+        # client/server sessions alike
+        connection = servermanager.ActiveConnection
+        return connection.Session.GetProgressHandler() if connection else None
+
+    def publishLoadProgress(self, task, handler):
+        step = handler.GetLastProgress() / 100.0
+        task['progress'] = (task['executed'] + step) / len(task['steps'])
+        self.publish('light.viz.dataset.progress', self.getLoadInfo(task))
+
+    def executeLoadStep(self, task):
+        if task['state'] == 'cancelled':
+            return self.finishLoad(task)
+        # The reader blocks the event loop while it executes, its progress
+        # comes from the session
+        handler = self.getProgressHandler()
+        observer = None
+        if handler:
+            observer = handler.AddObserver('ProgressEvent', lambda obj, event: self.publishLoadProgress(task, obj))
+        try:
+            task['steps'][task['executed']].UpdatePipeline()
+        except:
+            task['error'] = traceback.format_exc()
+            return self.finishLoad(task)
+        finally:
+            if observer is not None:
+                handler.RemoveObserver(observer)
+        task['executed'] += 1
+        task['progress'] = float(task['executed']) / len(task['steps'])
+        if task['executed'] < len(task['steps']):
+            self.publish('light.viz.dataset.progress', self.getLoadInfo(task))
+            schedule_callback(0, self.executeLoadStep, task)
+        else:
+            self.finishLoad(task)
+
+    def finishLoad(self, task):
+        if task['state'] == 'cancelled' or task['error']:
+            self.deleteReaders(task['readers'])
+            if task['error']:
+                task['state'] = 'error'
+        else:
+            if self.dataset:
+                self.releaseDataset()
+            self.readerPoolStats['misses'] += 1
+            self.useReaders(task['dataset'], task['readers'])
+            self.showDataset()
+            task['state'] = 'done'
+            task['progress'] = 1.0
+
+        if self.loadTask is task:
+            self.loadTask = None
+        self.publish('light.viz.dataset.progress', self.getLoadInfo(task))
+
+    @exportRpc("light.viz.dataset.load.cancel")
+    def cancelLoad(self, taskId=None):
+        task = self.loadTask
+        if task and task['state'] == 'loading' and (taskId is None or task['id'] == taskId):
+            # Its readers are deleted by the next step instead of executing
+            task['state'] = 'cancelled'
+            return True
+        return False
+
+    @exportRpc("light.viz.dataset.load.status")
+    def getLoadStatus(self):
+        if self.loadTask:
+            return self.getLoadInfo(self.loadTask)
+        return None
+
+    @exportRpc("light.viz.dataset.levels")
+    def getLevels(self):
+        levels = [ { 'factor': 1, 'file': self.activeMeta['data']['file'] } ]
+        levels += self.activeMeta['data'].get('levels', [])
+        return { 'active': self.activeLevel, 'levels': levels }
+
+    @exportRpc("light.viz.dataset.level")
+    def setLevel(self, level):
+        levels = self.activeMeta['data'].get('levels', [])
+        level = max(0, min(int(level), len(levels)))
+        if level != self.activeLevel:
+            self.activeLevel = level
+            self.replaceReader(simple.OpenDataFile(self.getDataFiles(self.activeMeta['name'], level)))
+            if self.timeCache:
+                # Pending read-ahead was for the previous level
+                self.prefetchGeneration += 1
+            renderScheduler.render(self.view)
+            renderScheduler.update(self.getApplication())
+        return self.activeLevel
+
     @exportRpc("light.viz.dataset.setblock.visibility")
     def setBlockVisibility(self, visible):
         # 0 block is always presumed to be needed since everything is under it
         if self.extractBlocks is None:
             return
         self.extractBlocks.BlockIndices = visible
-        self.getApplication().InvokeEvent('UpdateEvent')
+        self.notifyInputChanged()
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.dataset.getblockstructure")
     def getBlockStructure(self):
+        # Datasets imported with a block index do not need the reader
+        if 'blocks' in self.activeMeta['data']:
+            return self.activeMeta['data']['blocks']
         dataInfo = self.reader.GetDataInformation().DataInformation.GetCompositeDataInformation()
         if dataInfo.GetDataIsComposite() == 0:
             return []
@@ -319,6 +1049,28 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         a, index = processInfo(dataInfo, index)
         return a
 
+    @exportRpc("light.viz.dataset.getblockstats")
+    def getBlockStats(self, flatIndices=None):
+        # Selecting a block selects its whole subtree, like ExtractBlock does
+        blockStats = self.activeMeta['data'].get('blockStats', {})
+        selected = {}
+        def collect(nodes, inSelection):
+            for node in nodes:
+                nodeSelected = inSelection or flatIndices is None or node['flatindex'] in flatIndices
+                key = str(node['flatindex'])
+                if nodeSelected and key in blockStats:
+                    selected[key] = blockStats[key]
+                collect(node['children'], nodeSelected)
+        collect(self.activeMeta['data'].get('blocks', []), False)
+        return {
+            'blocks': selected,
+            'total': {
+                'numberOfCells': sum([ stats['numberOfCells'] for stats in selected.values() ]),
+                'numberOfPoints': sum([ stats['numberOfPoints'] for stats in selected.values() ]),
+                'memorySize': sum([ stats['memorySize'] for stats in selected.values() ]),
+            },
+        }
+
     def checkArrayInMap(self, array):
         if array not in self.colormaps:
             self.colormaps[array] = { 'preset': 'Cool to Warm', 'range': [0, 1] }
@@ -331,8 +1083,8 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         self.colormaps[array]['preset'] = presetName
         rtDataLUT = simple.GetColorTransferFunction(array);
         rtDataLUT.ApplyPreset(presetName, True)
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.colormap.setrange")
     def setColormapRange(self, array, newRange):
@@ -344,7 +1096,7 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         rtDataLUT.RescaleTransferFunction(newRange[0], newRange[1])
         opacityLUT = simple.GetOpacityTransferFunction(array)
         opacityLUT.RescaleTransferFunction(newRange[0], newRange[1])
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.colormap.rescale.todatarange")
     def setColormapRangeToDataRange(self, array):
@@ -357,10 +1109,24 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         rtDataOpacityTF = simple.GetOpacityTransferFunction(array)
         rtDataOpacityTF.RescaleTransferFunction(self.colormaps[array]['range'])
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
         return self.colormaps[array]['range']
 
+    @exportRpc("light.viz.colormap.rescale.topercentiles")
+    def setColormapRangeToPercentiles(self, array, lower='p1', upper='p99'):
+        if (array is None):
+            return
+        arrayMeta = self.getArrayMeta(array)
+        if arrayMeta is None:
+            return { 'error': 'Unknown array: %s' % array }
+        newRange = arrayMeta['range']
+        percentiles = arrayMeta.get('percentiles', {})
+        if lower in percentiles and upper in percentiles:
+            newRange = [percentiles[lower], percentiles[upper]]
+        self.setColormapRange(array, newRange)
+        return newRange
+
     @exportRpc("light.viz.colormap.get")
     def getColorMap(self, array):
         if (array is None):
@@ -382,7 +1148,7 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
         rtDataLUT = simple.GetOpacityTransferFunction(array);
         rtDataLUT.Points = points
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.opacitymap.get")
     def getOpacityMap(self, array):
@@ -396,6 +1162,51 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
             points.append(rtDataLUT.Points[i * 4 + 1])
         return points
 
+    def getArrayMeta(self, field, location=None):
+        for array in self.activeMeta['data']['arrays']:
+            if array['name'] == field and (location is None or array['location'] == location):
+                return array
+        return None
+
+    @exportRpc("light.viz.dataset.statistics")
+    def getArrayStatistics(self, field, location):
+        array = self.getArrayMeta(field, location)
+        if array is None:
+            return None
+        return {
+            'range': array['range'],
+            'histogram': array.get('histogram'),
+            'percentiles': array.get('percentiles'),
+            'timeRanges': array.get('timeRanges'),
+        }
+
+    @exportRpc("light.viz.dataset.threshold.preview")
+    def previewThreshold(self, field, location, rangeMin, rangeMax):
+        # Estimate how much of the data a threshold keeps from the histogram
+        # computed at import, partially covered bins count proportionally
+        array = self.getArrayMeta(field, location)
+        if array is None or 'histogram' not in array:
+            return None
+        histogram = array['histogram']
+        counts = histogram['counts']
+        low, high = histogram['range']
+        binWidth = (high - low) / float(len(counts)) if high > low else 0.0
+        total = sum(counts)
+        selected = 0.0
+        for i, count in enumerate(counts):
+            binMin = low + i * binWidth
+            binMax = binMin + binWidth
+            if binWidth == 0.0:
+                selected += count if rangeMin <= low <= rangeMax else 0
+            elif binMax > rangeMin and binMin < rangeMax:
+                overlap = min(binMax, rangeMax) - max(binMin, rangeMin)
+                selected += count * overlap / binWidth
+        return {
+            'count': int(round(selected)),
+            'total': total,
+            'fraction': selected / total if total else 0.0,
+        }
+
     @exportRpc("light.viz.foreground.color")
     def setForegroundColor(self, foreground):
         self.foreground = [ float(x) for x in foreground.split(' ')]
@@ -403,14 +1214,14 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
             obs.setForegroundColor(self.foreground)
         if self.datasetRep:
             self.datasetRep.DiffuseColor = self.foreground
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.background.color")
     def setBackgroundColor(self, background):
         self.background = [ float(x) for x in background.split(' ')]
         if self.view:
             self.view.Background = self.background
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.dataset.getstate")
     def getState(self):
@@ -430,23 +1241,101 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
     def updateOpacity(self, opacity):
         if self.datasetRep:
             self.datasetRep.Opacity = opacity
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
         return opacity
 
-    @exportRpc("light.viz.dataset.time")
-    def updateTime(self, timeIdx):
+    def setTimeIndex(self, timeIdx, forward=False, wrap=False):
         if len(self.anim.TimeKeeper.TimestepValues) > 0:
-            self.anim.TimeKeeper.Time = self.anim.TimeKeeper.TimestepValues[timeIdx]
-            self.getApplication().InvokeEvent('UpdateEvent')
+            t = self.anim.TimeKeeper.TimestepValues[timeIdx]
+            if self.timeCache:
+                readerTime = self.getReaderTime()
+            self.anim.TimeKeeper.Time = t
+            if self.timeCache:
+                # Pulled now so the reader tells whether a cache had the step
+                self.timeCache.UpdatePipeline(t)
+                self.timeCacheStats['misses' if self.getReaderTime() != readerTime else 'hits'] += 1
+            for l in self.dataListeners:
+                if hasattr(l, 'timeChanged'):
+                    l.timeChanged(t)
+            renderScheduler.update(self.getApplication())
+            self.schedulePrefetch(forward, wrap)
 
         return self.anim.TimeKeeper.Time
 
+    @exportRpc("light.viz.dataset.time")
+    def updateTime(self, timeIdx):
+        # Scrubbing takes over from the server side animation
+        self.playback = None
+        return self.setTimeIndex(timeIdx)
+
+    @exportRpc("light.viz.dataset.time.play")
+    def playTime(self, fps=10, loop=True):
+        timesteps = self.anim.TimeKeeper.TimestepValues
+        if len(timesteps) < 2:
+            return self.getPlayback()
+        current = self.anim.TimeKeeper.Time
+        index = min(range(len(timesteps)), key=lambda i: abs(timesteps[i] - current))
+        self.playback = {
+            'fps': max(0.1, float(fps)),
+            'loop': loop,
+            'start': time(),
+            'startIndex': index,
+            'index': index,
+            'frame': 0,
+            'frames': 0,
+            'dropped': 0,
+        }
+        schedule_callback(0, self.playFrame, self.playback)
+        return self.getPlayback()
+
+    def playFrame(self, playback):
+        # Frames follow the wall clock: when reading or rendering falls behind
+        # the target rate the late frames are skipped instead of queued
+        if playback is not self.playback:
+            return
+        timesteps = self.anim.TimeKeeper.TimestepValues
+        frame = int((time() - playback['start']) * playback['fps'])
+        if playback['frames'] > 0:
+            playback['dropped'] += max(0, frame - playback['frame'] - 1)
+        index = playback['startIndex'] + frame
+        last = index >= len(timesteps) - 1 and not playback['loop']
+        index = min(index, len(timesteps) - 1) if not playback['loop'] else index % len(timesteps)
+
+        playback['frame'] = frame
+        playback['frames'] += 1
+        playback['index'] = index
+        # Rendering this time and reading the following ones both run on the
+        # event loop, one after the other: they interleave, they do not overlap
+        t = self.setTimeIndex(index, True, playback['loop'])
+        self.publish('pv.time.change', { 'time': t, 'timeStep': index })
+
+        if last:
+            self.playback = None
+            return
+        delay = (frame + 1) / playback['fps'] - (time() - playback['start'])
+        schedule_callback(max(0, delay), self.playFrame, playback)
+
+    @exportRpc("light.viz.dataset.time.pause")
+    def pauseTime(self):
+        state = self.getPlayback()
+        self.playback = None
+        state['playing'] = False
+        return state
+
+    @exportRpc("light.viz.dataset.time.playback")
+    def getPlayback(self):
+        if not self.playback:
+            return { 'playing': False }
+        state = dict([ (key, self.playback[key]) for key in ['fps', 'loop', 'index', 'frames', 'dropped'] ])
+        state['playing'] = True
+        return state
+
     @exportRpc("light.viz.dataset.representation")
     def updateRepresentation(self, mode):
         if self.datasetRep:
             self.datasetRep.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.dataset.color")
     def updateColorBy(self, field, location):
@@ -465,14 +1354,14 @@ class LightVizDatasets(pv_protocols.ParaViewWebProtocol):
                     if pwfProxy:
                       vtkSMTransferFunctionProxy.RescaleTransferFunction(pwfProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.dataset.enable")
     def enableDataset(self, enable):
         self.datasetRep.Visibility = 1 if enable else 0
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -485,9 +1374,14 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
     def __init__(self, dataset_manager):
         super(LightVizClip, self).__init__()
         self.ds = dataset_manager
-        self.clipX = None
-        self.clipY = None
-        self.clipZ = None
+        # One box clip does the three axis aligned half-spaces in one pass,
+        # image and rectilinear data are cropped to a sub-extent instead
+        self.boxClip = None
+        self.subset = None
+        self.useSubset = False
+        self.coordinates = None
+        self.center = None
+        self.insideOut = [False, False, False]
         self.representation = None
         self.box = None
         self.boxRepr = None
@@ -498,8 +1392,8 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
     def dataChanged(self):
         self.updateRepresentation('Surface')
         self.updateColorBy('__SOLID__', '__SOLID__')
-        if self.clipX:
-            self.clipX.Input = self.ds.getInput()
+        if self.boxClip:
+            self.updateClipInput()
             bounds = self.ds.activeMeta['data']['bounds']
             self.updatePosition((bounds[1] + bounds[0])/2.0,
                                 (bounds[3] + bounds[2])/2.0,
@@ -512,15 +1406,106 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
         if self.representation:
             self.representation.DiffuseColor = foreground
 
+    def setInteractive(self, interactive):
+        # The sub-extent is cheap and its VOI is in full resolution indices,
+        # so only the box clip switches to the decimated input
+        if self.boxClip:
+            self.boxClip.Input = self.ds.getInteractiveInput() if interactive else self.ds.getInput()
+
+    def getClipBox(self):
+        # Each axis keeps the upper side of the position (lower side when
+        # inside out), extended past the data bounds so nothing else is cut
+        bounds = self.ds.activeMeta['data']['bounds']
+        low = []
+        high = []
+        for i in range(3):
+            pad = max(abs(bounds[2 * i + 1] - bounds[2 * i]) * 0.01, 1e-6)
+            if self.insideOut[i]:
+                low.append(bounds[2 * i] - pad)
+                high.append(max(self.center[i], bounds[2 * i] - pad))
+            else:
+                low.append(min(self.center[i], bounds[2 * i + 1] + pad))
+                high.append(bounds[2 * i + 1] + pad)
+        return low, high
+
+    def updateClipBox(self):
+        if self.boxClip:
+            low, high = self.getClipBox()
+            self.boxClip.ClipType.Position = low
+            self.boxClip.ClipType.Length = [ max(high[i] - low[i], 1e-12) for i in range(3) ]
+        if self.useSubset:
+            self.updateSubsetExtent()
+        for l in self.ds.dataListeners:
+            if hasattr(l, 'clipChanged'):
+                l.clipChanged()
+
+    def updateClipInput(self):
+        inpt = self.ds.getInput()
+        self.boxClip.Input = inpt
+        self.coordinates = None
+        useSubset = inpt.GetDataInformation().GetDataClassName() in SUBEXTENT_CLASSES
+        if useSubset and not self.subset:
+            # The sub-extent is a copy of that part of the arrays, VTK cannot
+            # share a buffer with a grid of a smaller extent
+            self.subset = simple.ExtractSubset(Input=inpt)
+        elif self.subset:
+            self.subset.Input = inpt
+        if useSubset != self.useSubset and self.representation:
+            # The clip shows another proxy, its representation is rebuilt by enableClip
+            simple.Delete(self.representation)
+            self.representation = None
+        self.useSubset = useSubset
+
+    def getAxisCoordinates(self, axis):
+        info = self.ds.getInput().GetDataInformation()
+        if info.GetDataClassName() == 'vtkRectilinearGrid':
+            if self.coordinates is None:
+                self.coordinates = self.fetchCoordinates(self.ds.getInput(), info.GetExtent())
+            return self.coordinates[axis]
+        extent = info.GetExtent()
+        bounds = info.GetBounds()
+        count = extent[2 * axis + 1] - extent[2 * axis] + 1
+        if count < 2:
+            return [ bounds[2 * axis] ]
+        step = (bounds[2 * axis + 1] - bounds[2 * axis]) / (count - 1)
+        return [ bounds[2 * axis] + k * step for k in range(count) ]
+
+    def fetchCoordinates(self, inpt, extent):
+        # Works in client/server mode too: only one row of points per axis
+        # is brought over from the data server
+        coordinates = []
+        for axis in range(3):
+            voi = [extent[0], extent[0], extent[2], extent[2], extent[4], extent[4]]
+            voi[2 * axis + 1] = extent[2 * axis + 1]
+            row = simple.ExtractSubset(Input=inpt, VOI=voi)
+            data = servermanager.Fetch(row)
+            coords = [data.GetXCoordinates, data.GetYCoordinates, data.GetZCoordinates][axis]()
+            coordinates.append([ coords.GetValue(k) for k in range(coords.GetNumberOfTuples()) ])
+            simple.Delete(row)
+        return coordinates
+
+    def updateSubsetExtent(self):
+        # Keep every cell touching the clip box, the output stays a grid of
+        # the input type instead of becoming an unstructured grid
+        low, high = self.getClipBox()
+        extent = self.ds.getInput().GetDataInformation().GetExtent()
+        voi = []
+        for i in range(3):
+            coords = self.getAxisCoordinates(i)
+            first = max(bisect.bisect_right(coords, low[i]) - 1, 0)
+            last = min(bisect.bisect_left(coords, high[i]), len(coords) - 1)
+            voi += [ extent[2 * i] + first, extent[2 * i] + last ]
+        self.subset.VOI = voi
+
     @exportRpc("light.viz.clip.box.position")
     def updatePositionForBox(self, x, y, z):
         newClipCenter = [x, y, z]
         boundsPoint = [self.ds.activeMeta['data']['bounds'][2 * i] for i in range(3)]
-        if not self.clipX.InsideOut:
+        if not self.insideOut[0]:
             boundsPoint[0] = self.ds.activeMeta['data']['bounds'][1]
-        if not self.clipY.InsideOut:
+        if not self.insideOut[1]:
             boundsPoint[1] = self.ds.activeMeta['data']['bounds'][3]
-        if not self.clipZ.InsideOut:
+        if not self.insideOut[2]:
             boundsPoint[2] = self.ds.activeMeta['data']['bounds'][5]
         if self.box:
             self.box.Center = [(newClipCenter[i] + boundsPoint[i]) * 0.5 for i in range(3)]
@@ -528,7 +1513,7 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
             self.box.YLength = abs(boundsPoint[1] - newClipCenter[1])
             self.box.ZLength = abs(boundsPoint[2] - newClipCenter[2])
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.clip.box.show")
     def showBox(self, enable):
@@ -546,7 +1531,7 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
         elif (not enable) and self.boxRepr:
             self.boxRepr.Visibility = 0
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
 
     @exportRpc("light.viz.clip.getstate")
@@ -564,13 +1549,13 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
         }
         if self.representation:
             ret["enabled"] = self.representation.Visibility == 1,
-        if self.clipX:
-            ret["xPosition"] = self.clipX.ClipType.Origin[0]
-            ret["yPosition"] = self.clipY.ClipType.Origin[1]
-            ret["zPosition"] = self.clipZ.ClipType.Origin[2]
-            ret["xInsideOut"] = self.clipX.InsideOut == 1
-            ret["yInsideOut"] = self.clipY.InsideOut == 1
-            ret["zInsideOut"] = self.clipZ.InsideOut == 1
+        if self.boxClip:
+            ret["xPosition"] = self.center[0]
+            ret["yPosition"] = self.center[1]
+            ret["zPosition"] = self.center[2]
+            ret["xInsideOut"] = self.insideOut[0]
+            ret["yInsideOut"] = self.insideOut[1]
+            ret["zInsideOut"] = self.insideOut[2]
 
         if not isinstance(ret["enabled"], bool):
             ret["enabled"] = ret["enabled"][0]
@@ -578,33 +1563,30 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
         return ret
 
     @exportRpc("light.viz.clip.position")
+    def requestPosition(self, x, y, z):
+        parameterCoalescer.submit('light.viz.clip.position', self.updatePosition, x, y, z)
+
     def updatePosition(self, x, y, z):
-        if self.clipX:
-            self.clipX.ClipType.Origin = [float(x), 0.0, 0.0]
-        if self.clipY:
-            self.clipY.ClipType.Origin = [0.0, float(y), 0.0]
-        if self.clipZ:
-            self.clipZ.ClipType.Origin = [0.0, 0.0, float(z)]
+        if self.boxClip:
+            self.center = [float(x), float(y), float(z)]
+            self.updateClipBox()
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.clip.insideout")
     def updateInsideOut(self, x, y, z):
-        if self.clipX:
-            self.clipX.InsideOut = 1 if x else 0
-        if self.clipY:
-            self.clipY.InsideOut = 1 if y else 0
-        if self.clipZ:
-            self.clipZ.InsideOut = 1 if z else 0
+        if self.boxClip:
+            self.insideOut = [bool(x), bool(y), bool(z)]
+            self.updateClipBox()
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.clip.representation")
     def updateRepresentation(self, mode):
         self.reprMode = mode
         if self.representation:
             self.representation.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.clip.color")
     def updateColorBy(self, field, location):
@@ -623,30 +1605,20 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
                           vtkSMTransferFunctionProxy.RescaleTransferFunction(pwfProxy.SMProxy, array['range'][0], array['range'][1], False)
 
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.clip.enable")
     def enableClip(self, enable):
         if enable and self.ds.getInput():
-            if not self.clipX:
-                bounds = self.ds.activeMeta['data']['bounds']
-                center = [(bounds[i*2] + bounds[i*2+1])*0.5 for i in range(3)]
-                self.clipX = simple.Clip(Input=self.ds.getInput())
-                self.clipY = simple.Clip(Input=self.clipX)
-                self.clipZ = simple.Clip(Input=self.clipY)
-
-                self.clipX.ClipType.Origin = center
-                self.clipX.ClipType.Normal = [1, 0, 0]
-                self.clipY.ClipType.Origin = center
-                self.clipY.ClipType.Normal = [0, 1, 0]
-                self.clipZ.ClipType.Origin = center
-                self.clipZ.ClipType.Normal = [0, 0, 1]
+            if not self.boxClip:
+                self.createClip()
             else:
-                self.clipX.Input = self.ds.getInput()
+                self.updateClipInput()
+                self.updateClipBox()
 
             if not self.representation:
-                self.representation = simple.Show(self.clipZ)
+                self.representation = simple.Show(self.getOutput())
                 self.representation.Representation = self.reprMode
                 self.representation.DiffuseColor = self.ds.foreground
                 self.updateColorBy(self.colorBy[1], self.colorBy[0])
@@ -656,25 +1628,26 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
-    def getOutput(self):
-        if not self.clipX:
-            bounds = self.ds.activeMeta['data']['bounds']
-            center = [(bounds[i*2] + bounds[i*2+1])*0.5 for i in range(3)]
-            self.clipX = simple.Clip(Input=self.ds.getInput())
-            self.clipY = simple.Clip(Input=self.clipX)
-            self.clipZ = simple.Clip(Input=self.clipY)
+    def createClip(self):
+        bounds = self.ds.activeMeta['data']['bounds']
+        self.center = [(bounds[i*2] + bounds[i*2+1])*0.5 for i in range(3)]
+        self.boxClip = simple.Clip(Input=self.ds.getInput())
+        self.boxClip.ClipType = 'Box'
+        self.boxClip.ClipType.UseReferenceBounds = 0
+        self.boxClip.ClipType.Rotation = [0, 0, 0]
+        # Keep what is inside the box
+        self.boxClip.InsideOut = 1
+        self.updateClipInput()
+        self.updateClipBox()
 
-            self.clipX.ClipType.Origin = center
-            self.clipX.ClipType.Normal = [1, 0, 0]
-            self.clipY.ClipType.Origin = center
-            self.clipY.ClipType.Normal = [0, 1, 0]
-            self.clipZ.ClipType.Origin = center
-            self.clipZ.ClipType.Normal = [0, 0, 1]
+    def getOutput(self):
+        if not self.boxClip:
+            self.createClip()
 
-        return self.clipZ
+        return self.subset if self.useSubset else self.boxClip
 
 
 
@@ -684,13 +1657,119 @@ class LightVizClip(pv_protocols.ParaViewWebProtocol):
 #
 # =============================================================================
 
+class SpanSpaceIndex(object):
+    """Span space indices (cells bucketed by the min/max of their scalars) of
+    the contoured fields, one per input and array. Once an index is built, an
+    isovalue change only visits the cells whose range holds the value."""
+
+    def __init__(self, maxMemory=256):
+        self.maxMemory = maxMemory * 1024 * 1024
+        self.trees = collections.OrderedDict()
+        self.stats = { 'builds': 0, 'reused': 0, 'evicted': 0 }
+
+    def getTree(self, key, numberOfCells, stamp):
+        # The tree is built again by the contour whenever its input data
+        # differs from the one it was last built for
+        entry = self.trees.pop(key, None)
+        if entry is None:
+            entry = { 'tree': vtkSpanSpace(), 'cells': numberOfCells, 'stamp': None }
+        if entry['stamp'] == stamp:
+            self.stats['reused'] += 1
+        else:
+            self.stats['builds'] += 1
+        entry['stamp'] = stamp
+        entry['cells'] = numberOfCells
+        self.trees[key] = entry
+
+        # Drop the least recently used indices, never the one in use
+        while len(self.trees) > 1 and self.getMemory() > self.maxMemory:
+            self.trees.popitem(last=False)
+            self.stats['evicted'] += 1
+
+        return entry['tree']
+
+    def getMemory(self):
+        return sum([ entry['cells'] for entry in self.trees.values() ]) * SPAN_SPACE_CELL_BYTES
+
+    def clear(self):
+        self.trees.clear()
+
+    def getStats(self):
+        stats = dict(self.stats)
+        stats['indices'] = [ { 'field': key[1], 'cells': entry['cells'], 'memory': entry['cells'] * SPAN_SPACE_CELL_BYTES }
+                             for key, entry in self.trees.items() ]
+        stats['memory'] = self.getMemory()
+        stats['maxMemory'] = self.maxMemory
+        return stats
+
+
+class IsosurfaceCache(object):
+    """Contour outputs of the recently visited parameters, least recently
+    used first, so that going back to a field, isovalue or timestep does not
+    contour again."""
+
+    def __init__(self, maxMemory=256):
+        self.maxMemory = maxMemory * 1024 * 1024
+        self.entries = collections.OrderedDict()
+        self.memory = 0
+        self.stats = { 'hits': 0, 'misses': 0, 'evicted': 0 }
+
+    def get(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self.entries[key] = entry
+        return entry['data']
+
+    def add(self, key, data):
+        memory = data.GetActualMemorySize() * 1024
+        if memory > self.maxMemory:
+            return
+        if key in self.entries:
+            self.memory -= self.entries.pop(key)['memory']
+        self.entries[key] = { 'data': data, 'memory': memory }
+        self.memory += memory
+        while self.memory > self.maxMemory:
+            key, entry = self.entries.popitem(last=False)
+            self.memory -= entry['memory']
+            self.stats['evicted'] += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.memory = 0
+
+    def getStats(self):
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = float(stats['hits']) / lookups if lookups else 0.0
+        stats['entries'] = len(self.entries)
+        stats['memory'] = self.memory
+        stats['maxMemory'] = self.maxMemory
+        return stats
+
+
 class LightVizContour(pv_protocols.ParaViewWebProtocol):
 
-    def __init__(self, dataset_manager, clip):
+    def __init__(self, dataset_manager, clip, indexMemory=256, cacheMemory=256, threads=0):
         super(LightVizContour, self).__init__()
         self.ds = dataset_manager
         self.clip = clip
+        self.spanSpace = SpanSpaceIndex(indexMemory)
+        self.scalarTree = None
+        self.lastInputStamp = None
+        self.sameInputRuns = 0
+        self.isoCache = IsosurfaceCache(cacheMemory)
+        # 0 lets the SMP backend use every core
+        if threads > 0:
+            vtkSMPTools.Initialize(threads)
+        self.threadedContours = {}
+        self.contourPath = None
+        self.contourRuns = dict([ (path, 0) for path in CONTOUR_PATHS ])
         self.contour = None
+        # The representation shows the contour output through this producer
+        self.output = None
         self.contourByField = None
         self.representation = None
         self.reprMode = 'Surface'
@@ -701,6 +1780,10 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
     def dataChanged(self):
         self.updateRepresentation('Surface')
         self.updateColorBy(self.ds.activeMeta["data"]["arrays"][0]["name"], self.ds.activeMeta["data"]["arrays"][0]["location"])
+        # Indices of the previous dataset would keep its data alive
+        self.spanSpace.clear()
+        self.scalarTree = None
+        self.lastInputStamp = None
         if self.contour:
             self.contour.Input = self.ds.getInput()
             self.contour.Isosurfaces = [ sum(self.ds.activeMeta["data"]["arrays"][0]["range"]) * 0.5, ]
@@ -709,7 +1792,138 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
     def setForegroundColor(self, foreground):
         if self.representation:
             self.representation.DiffuseColor = foreground
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
+
+    def setInteractive(self, interactive):
+        if self.contour and not self.useClippedInput:
+            self.contour.Input = self.ds.getInteractiveInput() if interactive else self.ds.getInput()
+            self.updateOutput()
+        elif self.contour:
+            # The clip switches its own input
+            self.clipChanged()
+
+    def timeChanged(self, t):
+        self.updateOutput()
+
+    def clipChanged(self):
+        # Applied from the event loop, once the other modules have caught up
+        # with a dataset change
+        if self.contour and self.useClippedInput:
+            self.requestOutput()
+
+    def inputChanged(self):
+        # Contours of the previous input can no longer be shown
+        self.isoCache.clear()
+        if self.contour:
+            self.requestOutput()
+
+    def requestOutput(self):
+        # Parameter changes of a batch or of one event loop iteration share
+        # a single contour
+        parameterCoalescer.submit('light.viz.contour.output', self.refreshOutput)
+
+    def refreshOutput(self):
+        self.updateOutput()
+        renderScheduler.update(self.getApplication())
+
+    def getCacheKey(self):
+        # The decimated input used while dragging is never cached
+        if self.ds.dragging:
+            return None
+        inpt = self.contour.Input
+        blocks = tuple(self.ds.extractBlocks.BlockIndices) if self.ds.extractBlocks else None
+        clipState = None
+        if self.useClippedInput:
+            clipState = (tuple(self.clip.center or []), tuple(self.clip.insideOut))
+        return (inpt.GetGlobalIDAsString(), self.ds.activeLevel, blocks, simple.GetTimeKeeper().Time,
+                tuple(self.contour.ContourBy), tuple(self.contour.Isosurfaces), self.useClippedInput, clipState)
+
+    def updateOutput(self):
+        # Without a producer the contour filter is shown and updates itself
+        if not self.output or (self.representation and not self.representation.Visibility):
+            return
+        key = self.getCacheKey()
+        data = self.isoCache.get(key) if key else None
+        if data is None:
+            data = self.runContour()
+            if key:
+                self.isoCache.add(key, data)
+        self.output.GetClientSideObject().SetOutput(data)
+        self.output.MarkModified(self.output)
+
+    def getContourPath(self, data, location, field):
+        if location != 'POINTS' or not field:
+            return 'generic'
+        # Flying edges ignores blanking, so uniform grids are left out
+        if data.GetClassName() in ['vtkImageData', 'vtkStructuredPoints'] and min(data.GetDimensions()) > 1:
+            return 'flyingEdges'
+        if data.GetClassName() == 'vtkUnstructuredGrid' and vtkContour3DLinearGrid.CanFullyProcessDataObject(data, field):
+            return 'linearGrid'
+        return 'generic'
+
+    def getThreadedContour(self, path):
+        if path not in self.threadedContours:
+            algo = vtkFlyingEdges3D() if path == 'flyingEdges' else vtkContour3DLinearGrid()
+            algo.ComputeNormalsOn()
+            algo.ComputeScalarsOn()
+            algo.InterpolateAttributesOn()
+            if path == 'linearGrid':
+                algo.MergePointsOn()
+            self.threadedContours[path] = algo
+        return self.threadedContours[path]
+
+    def runContour(self):
+        t = simple.GetTimeKeeper().Time
+        location = self.contour.ContourBy[0] if len(self.contour.ContourBy) > 1 else None
+        field = self.contour.ContourBy[1] if len(self.contour.ContourBy) > 1 else None
+        inpt = self.contour.Input
+        inpt.UpdatePipeline(t)
+        inputData = inpt.GetClientSideObject().GetOutputDataObject(0)
+        # An index only pays off when the same input is contoured again and
+        # again (isovalue sweeps), not while the time or the clip moves
+        stamp = (inputData.GetAddressAsString('vtkDataObject'), inputData.GetMTime(), field)
+        self.sameInputRuns = self.sameInputRuns + 1 if stamp == self.lastInputStamp else 0
+        self.lastInputStamp = stamp
+        self.updateScalarTree(inpt, inputData, field, stamp)
+
+        path = self.getContourPath(inputData, location, field)
+        if path == 'generic':
+            self.contour.UpdatePipeline(t)
+            output = self.contour.GetClientSideObject().GetOutputDataObject(0)
+        else:
+            algo = self.getThreadedContour(path)
+            algo.SetInputData(inputData)
+            algo.SetInputArrayToProcess(0, 0, 0, vtkDataObject.FIELD_ASSOCIATION_POINTS, field)
+            values = [ v for v in self.contour.Isosurfaces ]
+            algo.SetNumberOfContours(len(values))
+            for i, value in enumerate(values):
+                algo.SetValue(i, value)
+            if path == 'linearGrid':
+                # Threads work through the span space index when there is one
+                algo.SetScalarTree(self.scalarTree)
+                algo.SetUseScalarTree(1 if self.scalarTree else 0)
+            algo.Update()
+            output = algo.GetOutput()
+            algo.SetInputData(None)
+
+        self.contourPath = path
+        self.contourRuns[path] += 1
+        data = output.NewInstance()
+        data.ShallowCopy(output)
+        return data
+
+    def updateScalarTree(self, inpt, inputData, field, stamp):
+        if field and inputData.GetClassName() in SPAN_SPACE_CLASSES and self.sameInputRuns >= SPAN_SPACE_MIN_RUNS:
+            key = (inpt.GetGlobalIDAsString(), field)
+            self.scalarTree = self.spanSpace.getTree(key, inputData.GetNumberOfCells(), stamp)
+        else:
+            self.scalarTree = None
+        contourFilter = self.contour.GetClientSideObject()
+        if self.scalarTree:
+            contourFilter.SetScalarTree(self.scalarTree)
+            contourFilter.UseScalarTreeOn()
+        else:
+            contourFilter.UseScalarTreeOff()
 
     @exportRpc("light.viz.contour.useclipped")
     def setUseClipped(self, useClipped):
@@ -719,7 +1933,27 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
             elif self.useClippedInput and not useClipped:
                 self.contour.Input = self.ds.getInput()
         self.useClippedInput = useClipped
-        self.getApplication().InvokeEvent('UpdateEvent')
+        if self.contour:
+            self.requestOutput()
+
+    @exportRpc("light.viz.contour.index")
+    def getIndexStats(self):
+        stats = self.spanSpace.getStats()
+        stats['active'] = self.scalarTree is not None
+        return stats
+
+    @exportRpc("light.viz.contour.cache")
+    def getCacheStats(self):
+        return self.isoCache.getStats()
+
+    @exportRpc("light.viz.contour.algorithm")
+    def getAlgorithm(self):
+        return {
+            'path': self.contourPath,
+            'runs': dict(self.contourRuns),
+            'threads': vtkSMPTools.GetEstimatedNumberOfThreads(),
+            'backend': vtkSMPTools.GetBackend() if hasattr(vtkSMPTools, 'GetBackend') else None,
+        }
 
     @exportRpc("light.viz.contour.getstate")
     def getState(self):
@@ -745,17 +1979,20 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
         return ret
 
     @exportRpc("light.viz.contour.values")
+    def requestValues(self, values):
+        self.updateValues(values)
+
     def updateValues(self, values):
         if self.contour:
             self.contour.Isosurfaces = values
-            self.getApplication().InvokeEvent('UpdateEvent')
+            self.requestOutput()
 
     @exportRpc("light.viz.contour.by")
     def updateContourBy(self, field):
         if self.contour:
             self.contourByField = None
             self.contour.ContourBy = field
-            self.getApplication().InvokeEvent('UpdateEvent')
+            self.requestOutput()
         else:
           self.contourByField = field
 
@@ -764,7 +2001,7 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
         self.reprMode = mode
         if self.representation:
             self.representation.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.contour.color")
     def updateColorBy(self, field, location):
@@ -779,8 +2016,8 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
                     if array['name'] == field and array['location'] == location:
                         vtkSMTransferFunctionProxy.RescaleTransferFunction(lutProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.contour.enable")
     def enableContour(self, enable):
@@ -788,22 +2025,33 @@ class LightVizContour(pv_protocols.ParaViewWebProtocol):
             inpt = self.ds.getInput() if not self.useClippedInput else self.clip.getOutput()
             if not self.contour:
                 self.contour = simple.Contour(Input=inpt, ComputeScalars=1, ComputeNormals=1)
-                self.representation = simple.Show(self.contour)
+                if self.contourByField:
+                  self.contour.ContourBy = self.contourByField
+                  self.contourByField = None
+                if isBuiltinSession():
+                    # Fill the producer first so the representation sees the arrays
+                    self.output = simple.PVTrivialProducer()
+                    self.updateOutput()
+                    self.representation = simple.Show(self.output)
+                else:
+                    # The data lives on a remote server: no cache, threaded
+                    # algorithms or index, the ParaView filter does the work
+                    self.representation = simple.Show(self.contour)
+                    self.contourPath = 'generic'
                 self.representation.Representation = self.reprMode
                 self.representation.DiffuseColor = self.ds.foreground
                 self.updateColorBy(self.colorBy[1], self.colorBy[0])
-                if self.contourByField:
-                  self.updateContourBy(self.contourByField)
             else:
                 self.contour.Input = inpt
-
-            self.representation.Visibility = 1
+                self.representation.Visibility = 1
+                # Hidden contours are not kept up to date
+                self.updateOutput()
 
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -855,6 +2103,11 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
             self.representationY.DiffuseColor = foreground
             self.representationZ.DiffuseColor = foreground
 
+    def setInteractive(self, interactive):
+        if self.sliceX and not self.useClippedInput:
+            for slice in [self.sliceX, self.sliceY, self.sliceZ]:
+                slice.Input = self.ds.getInteractiveInput() if interactive else self.ds.getInput()
+
     @exportRpc("light.viz.slice.useclipped")
     def setUseClipped(self, useClipped):
         if self.sliceX:
@@ -865,7 +2118,7 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
                 for slice in [self.sliceX, self.sliceY, self.sliceZ]:
                     slice.Input = self.ds.getInput()
         self.useClippedInput = useClipped
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
 
     @exportRpc("light.viz.slice.getstate")
@@ -893,6 +2146,9 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
         return ret
 
     @exportRpc("light.viz.slice.position")
+    def requestPosition(self, x, y, z):
+        parameterCoalescer.submit('light.viz.slice.position', self.updatePosition, x, y, z)
+
     def updatePosition(self, x, y, z):
         self.center = [x, y, z]
         if self.sliceX:
@@ -901,7 +2157,7 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
             self.sliceY.SliceType.Origin = self.center
         if self.sliceZ:
             self.sliceZ.SliceType.Origin = self.center
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.slice.visibility")
     def updateVisibility(self, x, y, z):
@@ -912,7 +2168,7 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
             self.representationY.Visibility = self.visible[1] and self.enabled
         if self.representationZ:
             self.representationZ.Visibility = self.visible[2] and self.enabled
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.slice.representation")
     def updateRepresentation(self, mode):
@@ -921,7 +2177,7 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
             self.representationX.Representation = mode
             self.representationY.Representation = mode
             self.representationZ.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.slice.color")
     def updateColorBy(self, field, location):
@@ -942,8 +2198,8 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
                       if array['name'] == field and array['location'] == location:
                           vtkSMTransferFunctionProxy.RescaleTransferFunction(lutProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.slice.enable")
     def enableSlice(self, enable):
@@ -989,8 +2245,8 @@ class LightVizSlice(pv_protocols.ParaViewWebProtocol):
             self.representationZ.Visibility = 0
 
         self.enabled = enable
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -1036,7 +2292,7 @@ class LightVizMultiSlice(pv_protocols.ParaViewWebProtocol):
             elif self.useClippedInput and not useClipped:
                 self.slice.Input = self.ds.getInput()
         self.useClippedInput = useClipped
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.mslice.getstate")
     def getState(self):
@@ -1060,21 +2316,21 @@ class LightVizMultiSlice(pv_protocols.ParaViewWebProtocol):
             normal = [0, 0, 0]
             normal[self.normal] = 1
             self.slice.SliceType.Normal = normal
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.mslice.positions")
     def updateSlicePositions(self, positions):
         self.slicePositions = positions;
         if self.slice:
             self.slice.SliceOffsetValues = positions
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.mslice.representation")
     def updateRepresentation(self, mode):
         self.reprMode = mode
         if self.representation:
             self.representation.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.mslice.color")
     def updateColorBy(self, field, location):
@@ -1090,8 +2346,8 @@ class LightVizMultiSlice(pv_protocols.ParaViewWebProtocol):
                     if array['name'] == field and array['location'] == location:
                         vtkSMTransferFunctionProxy.RescaleTransferFunction(lutProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.mslice.enable")
     def enableSlice(self, enable):
@@ -1114,8 +2370,8 @@ class LightVizMultiSlice(pv_protocols.ParaViewWebProtocol):
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -1191,21 +2447,21 @@ class LightVizStreamline(pv_protocols.ParaViewWebProtocol):
         if self.streamline:
             self.seed.Center = self.position
             self.streamline.SeedType.Center = self.position
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.vector")
     def updateVector(self, vectorName):
         self.vector = vectorName
         if self.streamline:
             self.streamline.Vectors = ['POINTS', self.vector]
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.numpoints")
     def updateNumPoints(self, num):
         self.numPoints = int(num)
         if self.streamline:
             self.streamline.SeedType.NumberOfPoints = self.numPoints
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.radius")
     def updateRadius(self, rad):
@@ -1213,14 +2469,14 @@ class LightVizStreamline(pv_protocols.ParaViewWebProtocol):
         if self.streamline:
             self.seed.Radius = self.radius
             self.streamline.SeedType.Radius = self.radius
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.representation")
     def updateRepresentation(self, mode):
         self.reprMode = mode
         if self.representation:
             self.representation.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.color")
     def updateColorBy(self, field, location):
@@ -1236,8 +2492,8 @@ class LightVizStreamline(pv_protocols.ParaViewWebProtocol):
                     if array['name'] == field and array['location'] == location:
                         vtkSMTransferFunctionProxy.RescaleTransferFunction(lutProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.enable")
     def enableStreamline(self, enable):
@@ -1280,8 +2536,8 @@ class LightVizStreamline(pv_protocols.ParaViewWebProtocol):
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.seed.show")
     def showSeed(self, enable):
@@ -1290,14 +2546,14 @@ class LightVizStreamline(pv_protocols.ParaViewWebProtocol):
         elif (not enable) and self.seedRep:
             self.seedRep.Visibility = 0
 
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.streamline.seed.update")
     def updateSeed(self, position, radius):
       if self.seed:
         self.seed.Center = position
         self.seed.Radius = radius
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -1341,7 +2597,7 @@ class LightVizVolume(pv_protocols.ParaViewWebProtocol):
                 self.enableVolume(oldVisibility)
 
 
-                self.getApplication().InvokeEvent('UpdateEvent')
+                renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.volume.getstate")
     def getState(self):
@@ -1375,8 +2631,8 @@ class LightVizVolume(pv_protocols.ParaViewWebProtocol):
                         if pwfProxy:
                           vtkSMTransferFunctionProxy.RescaleTransferFunction(pwfProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.volume.enable")
     def enableVolume(self, enable):
@@ -1395,8 +2651,8 @@ class LightVizVolume(pv_protocols.ParaViewWebProtocol):
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
 
 # =============================================================================
 #
@@ -1439,7 +2695,7 @@ class LightVizThreshold(pv_protocols.ParaViewWebProtocol):
     def setUseClipped(self, useClipped):
         if self.useClippedInput != useClipped:
             self.useClippedInput = useClipped
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.threshold.getstate")
     def getState(self):
@@ -1460,15 +2716,18 @@ class LightVizThreshold(pv_protocols.ParaViewWebProtocol):
         self.reprMode = mode
         if self.representation:
             self.representation.Representation = mode
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.threshold.range")
+    def requestRange(self, rangeMin, rangeMax):
+        parameterCoalescer.submit('light.viz.threshold.range', self.updateRange, rangeMin, rangeMax)
+
     def updateRange(self, rangeMin, rangeMax):
         self.rangeMin = rangeMin
         self.rangeMax = rangeMax
         if self.thresh:
             self.thresh.ThresholdRange = [self.rangeMin, self.rangeMax]
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.threshold.color")
     def updateColorBy(self, field, location):
@@ -1487,8 +2746,8 @@ class LightVizThreshold(pv_protocols.ParaViewWebProtocol):
                         if pwfProxy:
                           vtkSMTransferFunctionProxy.RescaleTransferFunction(pwfProxy.SMProxy, array['range'][0], array['range'][1], False)
 
-            simple.Render()
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.render()
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.threshold.by")
     def updateThresholdBy(self, field):
@@ -1496,7 +2755,7 @@ class LightVizThreshold(pv_protocols.ParaViewWebProtocol):
         if self.thresh:
             self.thresh.Scalars = ['POINTS', field]
             # simple.SaveState('/tmp/myteststate.pvsm')
-            self.getApplication().InvokeEvent('UpdateEvent')
+            renderScheduler.update(self.getApplication())
 
     @exportRpc("light.viz.threshold.enable")
     def enableThreshold(self, enable):
@@ -1512,5 +2771,5 @@ class LightVizThreshold(pv_protocols.ParaViewWebProtocol):
         if not enable and self.representation:
             self.representation.Visibility = 0
 
-        simple.Render()
-        self.getApplication().InvokeEvent('UpdateEvent')
+        renderScheduler.render()
+        renderScheduler.update(self.getApplication())
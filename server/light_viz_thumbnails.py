@@ -0,0 +1,175 @@
+import os
+import collections
+import traceback
+
+from paraview import simple
+
+from vtkmodules.vtkImagingCore import vtkImageResize
+from vtkmodules.vtkIOImage import vtkPNGReader, vtkJPEGReader, vtkPNGWriter, vtkJPEGWriter
+
+# The first size is the one listed in 'thumbnails', the others (and the other
+# formats) are recorded under 'thumbnailVariants'
+THUMBNAIL_SIZES = [400, 200, 100]
+THUMBNAIL_FORMATS = ['png', 'jpg']
+
+# Representation properties copied from the interactive view
+REPRESENTATION_PROPERTIES = [
+    'Representation',
+    'ColorArrayName',
+    'LookupTable',
+    'ScalarOpacityFunction',
+    'MapScalars',
+    'DiffuseColor',
+    'AmbientColor',
+    'Opacity',
+]
+
+CAMERA_PROPERTIES = [
+    'CameraPosition',
+    'CameraFocalPoint',
+    'CameraViewUp',
+    'CameraViewAngle',
+    'CameraParallelScale',
+    'CameraParallelProjection',
+]
+
+def getPropertyValue(proxy, name):
+    value = getattr(proxy, name)
+    if hasattr(value, 'GetData'):
+        value = value.GetData()
+    return value
+
+def isAlive(proxy):
+    # Deleted proxies are unregistered from the proxy manager
+    return proxy in simple.GetSources().values()
+
+def snapshotView(view):
+    """Capture what a view shows (visible inputs with their display settings,
+    camera and background) so it can be rendered later in another view."""
+    representations = []
+    for rep in view.Representations:
+        properties = rep.ListProperties()
+        if 'Input' not in properties or not rep.Visibility:
+            continue
+        settings = {}
+        for name in REPRESENTATION_PROPERTIES:
+            if name in properties:
+                settings[name] = getPropertyValue(rep, name)
+        representations.append((rep.Input, settings))
+    return {
+        'representations': representations,
+        'camera': dict([ (name, getPropertyValue(view, name)) for name in CAMERA_PROPERTIES ]),
+        'background': getPropertyValue(view, 'Background'),
+    }
+
+class ThumbnailRenderer(object):
+    """Render thumbnails in a dedicated offscreen view so the size of the
+    interactive view is never touched. With a scheduler, jobs are queued and
+    rendered one at a time outside of the calling RPC."""
+
+    def __init__(self, sizes=THUMBNAIL_SIZES, formats=THUMBNAIL_FORMATS, scheduler=None):
+        self.sizes = sizes
+        self.formats = formats
+        self.scheduler = scheduler
+        self.view = None
+        self.queue = collections.deque()
+        self.scheduled = False
+
+    def getView(self):
+        if self.view is None:
+            # CreateView makes the new view active, keep the current one
+            activeView = simple.GetActiveView()
+            self.view = simple.CreateView('RenderView')
+            self.view.OrientationAxesVisibility = 0
+            self.view.ViewSize = [max(self.sizes), max(self.sizes)]
+            if activeView:
+                simple.SetActiveView(activeView)
+        return self.view
+
+    def render(self, snapshot, basePath, fileName):
+        view = self.getView()
+        reps = []
+        sources = [ (source, settings) for source, settings in snapshot['representations'] if isAlive(source) ]
+        if not sources:
+            raise ValueError('Nothing left to render for %s' % fileName)
+        try:
+            for source, settings in sources:
+                rep = simple.Show(source, view)
+                reps.append(rep)
+                for name, value in settings.items():
+                    setattr(rep, name, value)
+            if snapshot.get('background'):
+                view.Background = snapshot['background']
+            if snapshot.get('camera'):
+                for name, value in snapshot['camera'].items():
+                    setattr(view, name, value)
+            else:
+                simple.ResetCamera(view)
+
+            simple.SaveScreenshot(os.path.join(basePath, fileName), view)
+        finally:
+            for rep in reps:
+                simple.Delete(rep)
+
+        return self.writeVariants(basePath, fileName)
+
+    def writeVariants(self, basePath, fileName):
+        # Every other size and format is derived from the single render
+        stem, extension = os.path.splitext(fileName)
+        extension = extension[1:].lower()
+        reader = vtkPNGReader() if extension == 'png' else vtkJPEGReader()
+        reader.SetFileName(os.path.join(basePath, fileName))
+        reader.Update()
+
+        variants = []
+        for size in self.sizes:
+            resize = vtkImageResize()
+            resize.SetInputConnection(reader.GetOutputPort())
+            resize.SetOutputDimensions(size, size, 1)
+            for fmt in self.formats:
+                if size == max(self.sizes) and fmt == extension:
+                    continue
+                if fmt == 'png':
+                    writer = vtkPNGWriter()
+                    writer.SetCompressionLevel(9)
+                else:
+                    writer = vtkJPEGWriter()
+                    writer.SetQuality(85)
+                    writer.ProgressiveOn()
+                variantName = '%s.%d.%s' % (stem, size, fmt)
+                writer.SetInputConnection(resize.GetOutputPort())
+                writer.SetFileName(os.path.join(basePath, variantName))
+                writer.Write()
+                variants.append({ 'file': variantName, 'size': [size, size], 'format': fmt })
+        return variants
+
+    def enqueue(self, snapshot, basePath, fileName, callback=None):
+        self.queue.append((snapshot, basePath, fileName, callback))
+        if self.scheduler is None:
+            self.processNext()
+        elif not self.scheduled:
+            self.scheduled = True
+            self.scheduler(0, self.processNext)
+
+    def pending(self):
+        return [ os.path.join(job[1], job[2]) for job in self.queue ]
+
+    def processNext(self):
+        self.scheduled = False
+        if not self.queue:
+            return
+        snapshot, basePath, fileName, callback = self.queue.popleft()
+        # A failing job (deleted proxy, unwritable directory...) must not
+        # block the ones queued after it
+        try:
+            variants = self.render(snapshot, basePath, fileName)
+            if callback:
+                callback(fileName, variants)
+        except:
+            traceback.print_exc()
+        if self.queue:
+            if self.scheduler is None:
+                self.processNext()
+            else:
+                self.scheduled = True
+                self.scheduler(0, self.processNext)
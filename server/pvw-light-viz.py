@@ -134,6 +134,14 @@ class LightVizServer(pv_wslink.PVServerProtocol):
     viewportScale=1.0
     viewportMaxWidth=2560
     viewportMaxHeight=1440
+    coarseFirst = False
+    readerPoolSize = 2
+    readerPoolMemory = 1024
+    timeCacheMemory = 512
+    timePrefetch = 2
+    contourIndexMemory = 256
+    contourCacheMemory = 256
+    contourThreads = 0
     config = {
         "profiles": {
             "default": {
@@ -160,6 +168,14 @@ class LightVizServer(pv_wslink.PVServerProtocol):
         parser.add_argument("--viewport-max-width", default=2560, type=int, help="Viewport maximum size in width", dest="viewportMaxWidth")
         parser.add_argument("--viewport-max-height", default=1440, type=int, help="Viewport maximum size in height", dest="viewportMaxHeight")
         parser.add_argument("--settings-lod-threshold", default=102400, type=int, help="LOD Threshold in Megabytes", dest="settingsLODThreshold")
+        parser.add_argument("--coarse-first", default=False, action="store_true", help="Open the coarsest pyramid level of image datasets first", dest="coarseFirst")
+        parser.add_argument("--reader-pool-size", default=2, type=int, help="Number of previously opened datasets kept loaded for fast switching (0 to disable)", dest="readerPoolSize")
+        parser.add_argument("--reader-pool-memory", default=1024, type=int, help="Memory budget in Megabytes of the previously opened datasets kept loaded", dest="readerPoolMemory")
+        parser.add_argument("--time-cache-memory", default=512, type=int, help="Memory budget in Megabytes of the timesteps cached for the active time series (0 to disable)", dest="timeCacheMemory")
+        parser.add_argument("--time-prefetch", default=2, type=int, help="Number of timesteps read ahead on each side of the current one", dest="timePrefetch")
+        parser.add_argument("--contour-index-memory", default=256, type=int, help="Memory budget in Megabytes of the span space indices used to contour unstructured data", dest="contourIndexMemory")
+        parser.add_argument("--contour-cache-memory", default=256, type=int, help="Memory budget in Megabytes of the contours kept for revisited fields, isovalues and timesteps (0 to disable)", dest="contourCacheMemory")
+        parser.add_argument("--contour-threads", default=0, type=int, help="Number of threads used to contour image data and unstructured grids (0 for all cores)", dest="contourThreads")
 
     @staticmethod
     def configure(args):
@@ -173,6 +189,14 @@ class LightVizServer(pv_wslink.PVServerProtocol):
         LightVizServer.viewportMaxWidth  = args.viewportMaxWidth
         LightVizServer.viewportMaxHeight = args.viewportMaxHeight
         LightVizServer.settingsLODThreshold = args.settingsLODThreshold
+        LightVizServer.coarseFirst = args.coarseFirst
+        LightVizServer.readerPoolSize = args.readerPoolSize
+        LightVizServer.readerPoolMemory = args.readerPoolMemory
+        LightVizServer.timeCacheMemory = args.timeCacheMemory
+        LightVizServer.timePrefetch = args.timePrefetch
+        LightVizServer.contourIndexMemory = args.contourIndexMemory
+        LightVizServer.contourCacheMemory = args.contourCacheMemory
+        LightVizServer.contourThreads = args.contourThreads
 
     def initialize(self):
         # Bring used components
@@ -184,16 +208,23 @@ class LightVizServer(pv_wslink.PVServerProtocol):
         self.registerVtkWebProtocol(pv_protocols.ParaViewWebPublishImageDelivery(decode=False))
 
         self.registerVtkWebProtocol(lv_protocols.LightVizConfig(LightVizServer.config, LightVizServer.profile))
-        datasetManager = lv_protocols.LightVizDatasets(LightVizServer.data)
+        datasetManager = lv_protocols.LightVizDatasets(LightVizServer.data, LightVizServer.coarseFirst, LightVizServer.readerPoolSize, LightVizServer.readerPoolMemory,
+                                                       LightVizServer.timeCacheMemory, LightVizServer.timePrefetch)
         clipManager = lv_protocols.LightVizClip(datasetManager)
-        self.registerVtkWebProtocol(datasetManager)
-        self.registerVtkWebProtocol(clipManager)
-        self.registerVtkWebProtocol(lv_protocols.LightVizContour(datasetManager, clipManager))
-        self.registerVtkWebProtocol(lv_protocols.LightVizSlice(datasetManager, clipManager))
-        self.registerVtkWebProtocol(lv_protocols.LightVizMultiSlice(datasetManager, clipManager))
-        self.registerVtkWebProtocol(lv_protocols.LightVizStreamline(datasetManager))
-        self.registerVtkWebProtocol(lv_protocols.LightVizThreshold(datasetManager, clipManager))
-        self.registerVtkWebProtocol(lv_protocols.LightVizVolume(datasetManager, clipManager))
+        modules = [
+            datasetManager,
+            clipManager,
+            lv_protocols.LightVizContour(datasetManager, clipManager, LightVizServer.contourIndexMemory,
+                                         LightVizServer.contourCacheMemory, LightVizServer.contourThreads),
+            lv_protocols.LightVizSlice(datasetManager, clipManager),
+            lv_protocols.LightVizMultiSlice(datasetManager, clipManager),
+            lv_protocols.LightVizStreamline(datasetManager),
+            lv_protocols.LightVizThreshold(datasetManager, clipManager),
+            lv_protocols.LightVizVolume(datasetManager, clipManager),
+        ]
+        for module in modules:
+            self.registerVtkWebProtocol(module)
+        self.registerVtkWebProtocol(lv_protocols.LightVizBatch(modules))
 
         # Update authentication key to use
         self.updateSecret(LightVizServer.authKey)